@@ -1,34 +1,21 @@
 from __future__ import annotations
 
 import asyncio
-import re
+import functools
 from collections.abc import Mapping
+from typing import Any
 from typing import NamedTuple
 
-import aiohttp
 import async_lru
 
 from bot.image_cache import download
 from bot.image_cache import local_image_path
 from bot.parse_message import terminology_image
 from bot.twitch_api import fetch_twitch_user
+from bot.twitch_api import helix_get
 
 
-@async_lru.alru_cache(maxsize=1)
-async def global_badges(
-        *,
-        oauth_token: str,
-        client_id: str,
-) -> Mapping[str, Mapping[str, str]]:
-    url = 'https://api.twitch.tv/helix/chat/badges/global'
-    headers = {
-        'Authorization': f'Bearer {oauth_token}',
-        'Client-ID': client_id,
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
-
+def _badge_urls(data: Any) -> Mapping[str, Mapping[str, str]]:
     return {
         v['set_id']: {
             version['id']: version['image_url_4x']
@@ -38,7 +25,19 @@ async def global_badges(
     }
 
 
-@async_lru.alru_cache(maxsize=1)
+async def global_badges(
+        *,
+        oauth_token: str,
+        client_id: str,
+) -> Mapping[str, Mapping[str, str]]:
+    data = await helix_get(
+        'https://api.twitch.tv/helix/chat/badges/global',
+        oauth_token=oauth_token,
+        client_id=client_id,
+    )
+    return _badge_urls(data)
+
+
 async def channel_badges(
         username: str,
         *,
@@ -52,25 +51,16 @@ async def channel_badges(
     )
     assert user is not None
 
-    url = f'https://api.twitch.tv/helix/chat/badges?broadcaster_id={user["id"]}'  # noqa: E501
-    headers = {
-        'Authorization': f'Bearer {oauth_token}',
-        'Client-ID': client_id,
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
-
-    return {
-        v['set_id']: {
-            version['id']: version['image_url_4x']
-            for version in v['versions']
-        }
-        for v in data['data']
-    }
+    data = await helix_get(
+        f'https://api.twitch.tv/helix/chat/badges?broadcaster_id={user["id"]}',
+        oauth_token=oauth_token,
+        client_id=client_id,
+    )
+    return _badge_urls(data)
 
 
-@async_lru.alru_cache(maxsize=1)
+# rebuilt every so often to pick up refreshed responses
+@async_lru.alru_cache(maxsize=1, ttl=60)
 async def all_badges(
         username: str,
         *,
@@ -87,28 +77,36 @@ async def all_badges(
     }
 
 
-def badges_plain_text(badges: tuple[str, ...]) -> str:
-    ret = ''
-    for s, reg in (
-        ('\033[48;2;000;000;000m⚙\033[m', re.compile('^staff/')),
-        ('\033[48;2;000;173;003m⚔\033[m', re.compile('^moderator/')),
-        ('\033[48;2;224;005;185m♦\033[m', re.compile('^vip/')),
-        ('\033[48;2;233;025;022m☞\033[m', re.compile('^broadcaster/')),
-        ('\033[48;2;130;005;180m★\033[m', re.compile('^founder/')),
-        ('\033[48;2;130;005;180m★\033[m', re.compile('^subscriber/')),
-        ('\033[48;2;000;160;214m♕\033[m', re.compile('^premium/')),
-        ('\033[48;2;089;057;154m♕\033[m', re.compile('^turbo/')),
-        ('\033[48;2;230;186;072m◘\033[m', re.compile('^sub-gift-leader/')),
-        ('\033[48;2;088;226;193m◘\033[m', re.compile('^sub-gifter/')),
-        ('\033[48;2;183;125;029m♕\033[m', re.compile('^hype-train/')),
-        ('\033[48;2;203;200;208m▴\033[m', re.compile('^bits/')),
-        ('\033[48;2;230;186;072m♦\033[m', re.compile('^bits-leader/')),
-        ('\033[48;2;145;070;255m☑\033[m', re.compile('^partner/')),
-    ):
-        for badge in badges:
-            if reg.match(badge):
-                ret += s
-    return ret
+# in display order
+BADGE_GLYPHS = {
+    'staff': '\033[48;2;000;000;000m⚙\033[m',
+    'moderator': '\033[48;2;000;173;003m⚔\033[m',
+    'vip': '\033[48;2;224;005;185m♦\033[m',
+    'broadcaster': '\033[48;2;233;025;022m☞\033[m',
+    'founder': '\033[48;2;130;005;180m★\033[m',
+    'subscriber': '\033[48;2;130;005;180m★\033[m',
+    'premium': '\033[48;2;000;160;214m♕\033[m',
+    'turbo': '\033[48;2;089;057;154m♕\033[m',
+    'sub-gift-leader': '\033[48;2;230;186;072m◘\033[m',
+    'sub-gifter': '\033[48;2;088;226;193m◘\033[m',
+    'hype-train': '\033[48;2;183;125;029m♕\033[m',
+    'bits': '\033[48;2;203;200;208m▴\033[m',
+    'bits-leader': '\033[48;2;230;186;072m♦\033[m',
+    'partner': '\033[48;2;145;070;255m☑\033[m',
+}
+_BADGE_ORDER = {name: i for i, name in enumerate(BADGE_GLYPHS)}
+
+
+# chat only has a handful of distinct badge combinations
+@functools.lru_cache(maxsize=256)
+def badges_plain_text(badges: str) -> str:
+    names = []
+    for badge in badges.split(','):
+        name, slash, _ = badge.partition('/')
+        if slash and name in BADGE_GLYPHS:
+            names.append(name)
+    names.sort(key=_BADGE_ORDER.__getitem__)
+    return ''.join(BADGE_GLYPHS[name] for name in names)
 
 
 class Badge(NamedTuple):
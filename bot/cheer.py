@@ -5,10 +5,10 @@ from collections.abc import Mapping
 from typing import Any
 from typing import NamedTuple
 
-import aiohttp
 import async_lru
 
 from bot.twitch_api import fetch_twitch_user
+from bot.twitch_api import helix_get
 
 
 class CheerTier(NamedTuple):
@@ -39,7 +39,8 @@ class CheerInfo(NamedTuple):
         return cls(prefix=dct['prefix'].lower(), tiers=tiers)
 
 
-@async_lru.alru_cache(maxsize=1)
+# rebuilt every so often to pick up refreshed responses
+@async_lru.alru_cache(maxsize=1, ttl=60)
 async def cheer_emotes(
         channel: str,
         *,
@@ -53,14 +54,11 @@ async def cheer_emotes(
     )
     assert user is not None
 
-    url = f'https://api.twitch.tv/helix/bits/cheermotes?broadcaster_id={user["id"]}'  # noqa: E501
-    headers = {
-        'Authorization': f'Bearer {oauth_token}',
-        'Client-ID': client_id,
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            data = await resp.json()
+    data = await helix_get(
+        f'https://api.twitch.tv/helix/bits/cheermotes?broadcaster_id={user["id"]}',  # noqa: E501
+        oauth_token=oauth_token,
+        client_id=client_id,
+    )
 
     infos = (CheerInfo.from_dct(dct) for dct in data['data'])
     cheer_info = {info.prefix: info for info in infos if info.tiers}
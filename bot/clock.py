@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import datetime
+import time
+from collections.abc import Callable
+from typing import NamedTuple
+
+
+class _Minute(NamedTuple):
+    start: float
+    end: float
+    dt_str: str
+    date: datetime.date
+    date_str: str
+
+
+class Clock:
+    """the local time, to the minute
+
+    values are formatted once per minute and served from a cache until the
+    next minute starts (utc offsets are whole minutes so the boundaries line
+    up with `time.time()`).  safe to use from threads.
+    """
+
+    def __init__(self, time_func: Callable[[], float] = time.time) -> None:
+        self.time_func = time_func
+        self._minute = _Minute(0, 0, '', datetime.date.min, '')
+
+    def _current(self) -> _Minute:
+        t = self.time_func()
+        minute = self._minute
+        # also refresh if the clock went backwards
+        if not minute.start <= t < minute.end:
+            dt = datetime.datetime.fromtimestamp(t)
+            start = t - t % 60
+            date = dt.date()
+            minute = self._minute = _Minute(
+                start=start,
+                end=start + 60,
+                dt_str=f'[{dt.hour:02}:{dt.minute:02}]',
+                date=date,
+                date_str=str(date),
+            )
+        return minute
+
+    def dt_str(self) -> str:
+        """`[HH:MM]`, as chat lines are prefixed"""
+        return self._current().dt_str
+
+    def today(self) -> datetime.date:
+        return self._current().date
+
+    def today_str(self) -> str:
+        """`YYYY-MM-DD`, as logs are named"""
+        return self._current().date_str
+
+
+CLOCK = Clock()
@@ -10,6 +10,7 @@ class Config(NamedTuple):
     client_id: str
     airnow_api_key: str
     openweathermap_api_key: str
+    image_cache_mb: int = 512
 
     @property
     def oauth_token_token(self) -> str:
@@ -25,5 +26,6 @@ class Config(NamedTuple):
             f'client_id={"***"!r}, '
             f'airnow_api_key={"***"!r}, '
             f'openweathermap_api_key={"***"!r}, '
+            f'image_cache_mb={self.image_cache_mb!r}, '
             f')'
         )
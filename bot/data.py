@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import difflib
+import functools
 import pkgutil
 import re
 from collections.abc import Awaitable
@@ -46,7 +47,10 @@ COMMANDS: dict[str, Callback] = {}
 POINTS_HANDLERS: dict[str, Callback] = {}
 BITS_HANDLERS: dict[int, Callback] = {}
 SECRET_CMDS: set[str] = set()
-PERIODIC_HANDLERS: list[tuple[int, Callback]] = []
+PERIODIC_HANDLERS: list[tuple[int, float, Callback]] = []
+BACKGROUND_HANDLERS: list[Callback] = []
+HANDLER_CONCURRENCY: dict[Callback, int] = {}
+LOG_LINE_HANDLERS: list[Callable[[str], None]] = []
 
 
 def handle_message(
@@ -96,39 +100,124 @@ def add_alias(cmd: str, *aliases: str) -> None:
         SECRET_CMDS.add(alias)
 
 
-def periodic_handler(*, seconds: int) -> Callable[[Callback], Callback]:
+def concurrency_limit(n: int) -> Callable[[Callback], Callback]:
+    """run at most `n` of this handler at once, the rest wait in line"""
+    def concurrency_limit_decorator(func: Callback) -> Callback:
+        HANDLER_CONCURRENCY[func] = n
+        return func
+    return concurrency_limit_decorator
+
+
+def periodic_handler(
+        *,
+        seconds: int,
+        jitter: float = 0,
+) -> Callable[[Callback], Callback]:
+    """called every `seconds`, each run delayed by up to `jitter` seconds"""
     def periodic_handler_decorator(func: Callback) -> Callback:
-        PERIODIC_HANDLERS.append((seconds, func))
+        PERIODIC_HANDLERS.append((seconds, jitter, func))
         return func
     return periodic_handler_decorator
 
 
-def get_handler(msg: str) -> tuple[Callback, Message] | None:
-    parsed = Message.parse(msg)
-    if parsed:
-        if 'custom-reward-id' in parsed.info:
-            if parsed.info['custom-reward-id'] in POINTS_HANDLERS:
-                return POINTS_HANDLERS[parsed.info['custom-reward-id']], parsed
-            else:
-                return None
+def background_handler(func: Callback) -> Callback:
+    """called back to back for the life of the bot
+
+    for handlers which wait on their own events rather than an interval
+    """
+    BACKGROUND_HANDLERS.append(func)
+    return func
+
+
+def log_line_handler(func: Callable[[str], None]) -> Callable[[str], None]:
+    """called with each (uncolored) line as it is logged"""
+    LOG_LINE_HANDLERS.append(func)
+    return func
+
+
+_INLINE_FLAGS = (
+    (re.ASCII, 'a'),
+    (re.IGNORECASE, 'i'),
+    (re.MULTILINE, 'm'),
+    (re.DOTALL, 's'),
+    (re.VERBOSE, 'x'),
+)
+
+
+def _inline_flags(pattern: Pattern[str]) -> str:
+    return ''.join(c for flag, c in _INLINE_FLAGS if pattern.flags & flag)
+
 
-        if 'bits' in parsed.info:
-            bits_n = int(parsed.info['bits'])
-            if bits_n % 100 in BITS_HANDLERS:
-                return BITS_HANDLERS[bits_n % 100], parsed
+# `\1` or `(?(1)...)`: still compiles once the groups are renumbered, but
+# then refers to the wrong group
+_NUMBERED_GROUP_REF_RE = re.compile(r'(?<!\\)(?:\\\\)*\\[1-9]|\(\?\(\d')
 
-        cmd_match = COMMAND_RE.match(parsed.msg)
-        if cmd_match:
-            command = f'!{cmd_match["cmd"].lstrip("!").lower()}'
-            if command in COMMANDS:
-                return COMMANDS[command], parsed
 
+@functools.lru_cache(maxsize=1)
+def _msg_handlers_re(
+        n_handlers: int,
+) -> tuple[Pattern[str], dict[int, Callback]] | None:
+    """combine MSG_HANDLERS into a single alternation
+
+    each pattern gets its own group so `match.lastindex` tells us which
+    handler won -- alternation is tried left to right so the first
+    registered handler still wins.
+    """
+    parts = []
+    group_to_handler = {}
+    group = 1
+    for pattern, handler in MSG_HANDLERS[:n_handlers]:
+        if _NUMBERED_GROUP_REF_RE.search(pattern.pattern):
+            return None
+
+        flags = _inline_flags(pattern)
+        if flags:
+            parts.append(f'((?{flags}:{pattern.pattern}))')
+        else:
+            parts.append(f'({pattern.pattern})')
+        group_to_handler[group] = handler
+        group += pattern.groups + 1
+
+    try:
+        return re.compile('|'.join(parts)), group_to_handler
+    except re.error:  # duplicate group names, etc.
+        return None
+
+
+def _match_msg_handler(msg: str) -> Callback | None:
+    compiled = _msg_handlers_re(len(MSG_HANDLERS))
+    if compiled is None:
         for pattern, handler in MSG_HANDLERS:
-            match = pattern.match(parsed.msg)
-            if match:
-                return handler, parsed
+            if pattern.match(msg):
+                return handler
+        else:
+            return None
+
+    reg, group_to_handler = compiled
+    match = reg.match(msg)
+    if match is None:
+        return None
+    else:
+        assert match.lastindex is not None
+        return group_to_handler[match.lastindex]
+
+
+def get_handler(msg: Message) -> Callback | None:
+    if 'custom-reward-id' in msg.info:
+        return POINTS_HANDLERS.get(msg.info['custom-reward-id'])
+
+    if 'bits' in msg.info:
+        bits_n = int(msg.info['bits'])
+        if bits_n % 100 in BITS_HANDLERS:
+            return BITS_HANDLERS[bits_n % 100]
+
+    cmd_match = COMMAND_RE.match(msg.msg)
+    if cmd_match:
+        command = f'!{cmd_match["cmd"].lstrip("!").lower()}'
+        if command in COMMANDS:
+            return COMMANDS[command]
 
-    return None
+    return _match_msg_handler(msg.msg)
 
 
 def _import_plugins() -> None:
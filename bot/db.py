@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from collections.abc import AsyncGenerator
+
+import aiosqlite
+
+from bot.migrations import migrate
+
+DB = 'db.db'
+
+_DB: tuple[aiosqlite.Connection, asyncio.Lock] | None = None
+
+
+@contextlib.asynccontextmanager
+async def database(filename: str = DB) -> AsyncGenerator[None]:
+    """the process-wide connection, `connect()` is valid inside"""
+    global _DB
+
+    async with aiosqlite.connect(filename) as db:
+        await db.execute('PRAGMA journal_mode=WAL')
+        await db.execute('PRAGMA synchronous=NORMAL')
+        await migrate(db)
+
+        prev, _DB = _DB, (db, asyncio.Lock())
+        try:
+            yield
+        finally:
+            _DB = prev
+
+
+@contextlib.asynccontextmanager
+async def connect() -> AsyncGenerator[aiosqlite.Connection]:
+    """borrow the shared connection
+
+    it is held exclusively so one handler's transaction can't be committed
+    (or rolled back) halfway through by another.
+    """
+    if _DB is None:
+        raise RuntimeError('connect() called outside of database()')
+
+    db, lock = _DB
+    async with lock:
+        try:
+            yield db
+        except BaseException:
+            await db.rollback()
+            raise
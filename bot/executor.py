@@ -0,0 +1,148 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import traceback
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from typing import NamedTuple
+
+from bot.data import Callback
+from bot.data import HANDLER_CONCURRENCY
+
+LIMIT = 16
+PER_HANDLER = 4
+QUEUE_SIZE = 128
+
+
+class _Work(NamedTuple):
+    handler: Callback
+    key: Hashable | None
+    func: Callable[[], Awaitable[None]]
+
+
+class HandlerExecutor:
+    """run handlers with bounded concurrency
+
+    at most `limit` handlers run at once, and each handler is capped at
+    `per_handler` (or its `concurrency_limit`).  the rest wait in line, up
+    to `queue_size` of them.
+
+    work with a `key` may be shed: it is dropped if the line is full, or
+    coalesced if work with the same key is already waiting.  work without
+    a key (bits, channel points) always waits its turn.
+    """
+
+    def __init__(
+            self,
+            *,
+            limit: int = LIMIT,
+            per_handler: int = PER_HANDLER,
+            queue_size: int = QUEUE_SIZE,
+    ) -> None:
+        self.limit = limit
+        self.per_handler = per_handler
+        self.queue_size = queue_size
+        self._queue: collections.deque[_Work] = collections.deque()
+        self._queued_keys: set[Hashable] = set()
+        self._running: collections.Counter[Callback] = collections.Counter()
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+
+        self.completed = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.max_queued = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    @property
+    def running(self) -> int:
+        return len(self._tasks)
+
+    def _can_start(self, handler: Callback) -> bool:
+        cap = HANDLER_CONCURRENCY.get(handler, self.per_handler)
+        return len(self._tasks) < self.limit and self._running[handler] < cap
+
+    def _start(self, work: _Work) -> None:
+        task = asyncio.ensure_future(work.func())
+        self._tasks.add(task)
+        self._running[work.handler] += 1
+        task.add_done_callback(
+            lambda task: self._done(task, handler=work.handler),
+        )
+
+    def _done(self, task: asyncio.Task[None], *, handler: Callback) -> None:
+        self._tasks.discard(task)
+        self._running[handler] -= 1
+        if not self._running[handler]:
+            del self._running[handler]
+        self.completed += 1
+
+        if not task.cancelled() and task.exception() is not None:
+            traceback.print_exception(task.exception())
+
+        self._start_queued()
+        if not self._tasks and not self._queue:
+            self._idle.set()
+
+    def _start_queued(self) -> None:
+        # in order, but a capped handler doesn't hold up the others
+        for work in tuple(self._queue):
+            if len(self._tasks) >= self.limit:
+                break
+            elif self._can_start(work.handler):
+                self._queue.remove(work)
+                self._queued_keys.discard(work.key)
+                self._start(work)
+
+    def submit(
+            self,
+            handler: Callback,
+            func: Callable[[], Awaitable[None]],
+            *,
+            key: Hashable | None = None,
+    ) -> bool:
+        """returns whether `func` was accepted (else it is never called)"""
+        if key is not None and key in self._queued_keys:
+            self.coalesced += 1
+            return False
+
+        if self._can_start(handler):
+            self._start(_Work(handler, key, func))
+        elif key is not None and len(self._queue) >= self.queue_size:
+            self.dropped += 1
+            return False
+        else:
+            self._queue.append(_Work(handler, key, func))
+            if key is not None:
+                self._queued_keys.add(key)
+            self.max_queued = max(self.max_queued, len(self._queue))
+
+        self._idle.clear()
+        return True
+
+    async def join(self) -> None:
+        """wait until nothing is running or waiting"""
+        await self._idle.wait()
+
+    async def stop(self) -> None:
+        self._queue.clear()
+        self._queued_keys.clear()
+
+        tasks = tuple(self._tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def report(self) -> str:
+        return (
+            f'handlers: completed={self.completed} '
+            f'running={self.running} queued={self.queued} '
+            f'max queued={self.max_queued} '
+            f'dropped={self.dropped} coalesced={self.coalesced}'
+        )
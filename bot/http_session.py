@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import contextlib
+import socket
+from collections.abc import AsyncGenerator
+
+import aiohttp
+from aiohttp.abc import AbstractResolver
+from aiohttp.abc import ResolveResult
+
+# connections are pooled and kept alive across requests, twitch's api and the
+# image cdn see most of the traffic so a single host gets a few of them
+CONNECTION_LIMIT = 100
+CONNECTION_LIMIT_PER_HOST = 8
+DNS_CACHE_SECONDS = 300
+TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+_SESSION: aiohttp.ClientSession | None = None
+
+
+class _OfflineResolver(AbstractResolver):
+    """every lookup fails, so requests fail as if the network were down"""
+
+    async def resolve(
+            self,
+            host: str,
+            port: int = 0,
+            family: socket.AddressFamily = socket.AF_INET,
+    ) -> list[ResolveResult]:
+        raise OSError(f'offline: not resolving {host}')
+
+    async def close(self) -> None:
+        pass
+
+
+@contextlib.asynccontextmanager
+async def client_session(
+        *,
+        offline: bool = False,
+) -> AsyncGenerator[aiohttp.ClientSession]:
+    """the application-wide session, `get_session()` is valid inside
+
+    with `offline`, no host names are resolved (and so nothing is fetched)
+    """
+    global _SESSION
+
+    connector = aiohttp.TCPConnector(
+        limit=CONNECTION_LIMIT,
+        limit_per_host=CONNECTION_LIMIT_PER_HOST,
+        ttl_dns_cache=DNS_CACHE_SECONDS,
+        resolver=_OfflineResolver() if offline else None,
+    )
+    async with aiohttp.ClientSession(
+            connector=connector,
+            timeout=TIMEOUT,
+    ) as session:
+        prev, _SESSION = _SESSION, session
+        try:
+            yield session
+        finally:
+            _SESSION = prev
+
+
+def get_session() -> aiohttp.ClientSession:
+    if _SESSION is None:
+        raise RuntimeError('get_session() called outside of client_session()')
+    return _SESSION
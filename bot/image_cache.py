@@ -1,13 +1,123 @@
 from __future__ import annotations
 
+import asyncio
+import collections
+import contextlib
 import functools
 import os.path
+import time
 
-import aiohttp
-
+from bot.http_session import get_session
 from bot.util import atomic_open
 
 CACHE = '.cache'
+BUDGET = 512 * 1024 * 1024
+# mtime doubles as the last access time so it survives a restart, but
+# keep the hot path free of syscalls by only refreshing it this often
+TOUCH_SECONDS = 60 * 60
+
+
+class ImageCache:
+    """an index of the images on disk, evicting the least recently used
+
+    the files themselves are the source of truth: the index is rebuilt
+    from their sizes and mtimes by `scan()` at startup.
+    """
+
+    def __init__(self, root: str, *, budget: int = BUDGET) -> None:
+        self.root = root
+        self.budget = budget
+        # path -> (size, last access), least recently used first
+        self._entries: collections.OrderedDict[str, tuple[int, float]]
+        self._entries = collections.OrderedDict()
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def scan(self) -> None:
+        found = []
+        with contextlib.suppress(FileNotFoundError):
+            for subtype in os.scandir(self.root):
+                if not subtype.is_dir():
+                    continue
+                for entry in os.scandir(subtype.path):
+                    if entry.name.endswith('.png'):
+                        st = entry.stat()
+                        found.append((st.st_mtime, entry.path, st.st_size))
+
+        self._entries.clear()
+        self.size = 0
+        for mtime, path, size in sorted(found):
+            self._entries[path] = (size, mtime)
+            self.size += size
+        self._evict()
+
+    def get(self, path: str) -> bool:
+        """whether `path` is on disk, counting it as used if so"""
+        try:
+            size, atime = self._entries[path]
+        except KeyError:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        self._entries.move_to_end(path)
+        now = time.time()
+        if now - atime > TOUCH_SECONDS:
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            self._entries[path] = (size, now)
+        return True
+
+    def add(self, path: str, size: int) -> None:
+        if path in self._entries:
+            self.size -= self._entries[path][0]
+        self._entries[path] = (size, time.time())
+        self._entries.move_to_end(path)
+        self.size += size
+        self._evict()
+
+    def _evict(self) -> None:
+        # never the newest, it is about to be displayed
+        while self.size > self.budget and len(self._entries) > 1:
+            path, (size, _) = self._entries.popitem(last=False)
+            self.size -= size
+            self.evictions += 1
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+
+    def report(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0
+        return (
+            f'image cache: {len(self)} images {self.size / 2 ** 20:.1f}MiB '
+            f'of {self.budget / 2 ** 20:.0f}MiB '
+            f'hit rate={hit_rate:.1%} evictions={self.evictions}'
+        )
+
+
+_CACHE: ImageCache | None = None
+# concurrent requests for the same image share one download
+_IN_FLIGHT: dict[str, asyncio.Future[None]] = {}
+
+
+def load(*, budget: int = BUDGET) -> ImageCache:
+    """(re)build the index from disk -- this blocks, call it at startup"""
+    global _CACHE
+    _CACHE = ImageCache(CACHE, budget=budget)
+    _CACHE.scan()
+    return _CACHE
+
+
+def get_cache() -> ImageCache:
+    if _CACHE is None:
+        raise RuntimeError('get_cache() called before load()')
+    return _CACHE
 
 
 @functools.lru_cache(maxsize=1)
@@ -23,19 +133,36 @@ def local_image_path(subtype: str, name: str) -> str:
     return os.path.join(CACHE, subtype, f'{name}.png')
 
 
-async def download(subtype: str, name: str, url: str) -> None:
-    img_path = local_image_path(subtype, name)
-    if os.path.exists(img_path):
-        return
-
+async def _download(img_path: str, subtype: str, url: str) -> None:
     img_dir = os.path.join(CACHE, subtype)
     os.makedirs(img_dir, exist_ok=True)
 
     _ensure_cache_gitignore()
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            data = await resp.read()
+    async with get_session().get(url) as resp:
+        data = await resp.read()
 
     with atomic_open(img_path) as f:
         f.write(data)
+    get_cache().add(img_path, len(data))
+
+
+def _download_done(img_path: str, fut: asyncio.Future[None]) -> None:
+    del _IN_FLIGHT[img_path]
+    # the waiters see the error, don't warn if they were all cancelled
+    if not fut.cancelled():
+        fut.exception()
+
+
+async def download(subtype: str, name: str, url: str) -> None:
+    img_path = local_image_path(subtype, name)
+    if get_cache().get(img_path):
+        return
+
+    fut = _IN_FLIGHT.get(img_path)
+    if fut is None:
+        fut = asyncio.ensure_future(_download(img_path, subtype, url))
+        fut.add_done_callback(functools.partial(_download_done, img_path))
+        _IN_FLIGHT[img_path] = fut
+    # one waiter being cancelled shouldn't cancel everyone's download
+    await asyncio.shield(fut)
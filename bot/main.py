@@ -2,8 +2,8 @@ from __future__ import annotations
 
 import argparse
 import asyncio.subprocess
+import concurrent.futures
 import contextlib
-import datetime
 import functools
 import json
 import os.path
@@ -12,27 +12,57 @@ import signal
 import sys
 import traceback
 from collections.abc import AsyncGenerator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from typing import IO
+from typing import NamedTuple
 
+from bot import image_cache
 from bot.badges import badges_images
 from bot.badges import badges_plain_text
 from bot.badges import download_all_badges
 from bot.badges import parse_badges
+from bot.clock import CLOCK
 from bot.config import Config
+from bot.data import BACKGROUND_HANDLERS
 from bot.data import Callback
 from bot.data import get_fake_msg
 from bot.data import get_handler
+from bot.data import LOG_LINE_HANDLERS
 from bot.data import PERIODIC_HANDLERS
 from bot.data import PRIVMSG
+from bot.db import database
+from bot.executor import HandlerExecutor
+from bot.http_session import client_session
 from bot.message import Message
+from bot.message import parse_tags
+from bot.outbound import SendQueue
 from bot.parse_message import colorize
 from bot.parse_message import parse_message_parts
 from bot.parse_message import parsed_to_terminology
+from bot.render import RenderQueue
+from bot.replay import load_transcript
+from bot.replay import REPLAY_HOST
+from bot.replay import ReplayServer
+from bot.replay import ReplayStats
+from bot.replay import sandbox
+from bot.scheduler import Scheduler
 
-# TODO: allow host / port to be configurable
 HOST = 'irc.chat.twitch.tv'
 PORT = 6697
 
 SEND_MSG_RE = re.compile('^PRIVMSG #[^ ]+ :(?P<msg>[^\r]+)')
+USERSTATE_RE = re.compile(r'^@(?P<info>[^ ]+) :tmi\.twitch\.tv USERSTATE #')
+# also sent because of the twitch.tv/commands capability, the bot has no use
+# for them so they aren't shown as unhandled
+IGNORED_RE = re.compile(
+    r'^(?:@[^ ]+ )?:tmi\.twitch\.tv '
+    r'(?:CLEARCHAT|CLEARMSG|GLOBALUSERSTATE|HOSTTARGET|ROOMSTATE|USERNOTICE) ',
+)
+# a failing background handler waits this long before it is run again,
+# doubling each failure in a row (seconds: first, longest)
+BACKGROUND_BACKOFF = (1., 300.)
 
 
 async def send(
@@ -62,9 +92,11 @@ async def recv(
 
 def _shutdown(
         writer: asyncio.StreamWriter,
+        log_writer: LogWriter,
         loop: asyncio.AbstractEventLoop,
 ) -> None:
     print('bye!')
+    log_writer.flush()
 
     if writer:
         writer.close()
@@ -73,21 +105,28 @@ def _shutdown(
 
 async def connect(
         config: Config,
+        log_writer: LogWriter,
         *,
+        host: str,
+        port: int,
+        ssl: bool,
         quiet: bool,
+        on_reconnect: Callable[[asyncio.StreamWriter], None],
 ) -> tuple[AsyncGenerator[bytes], asyncio.StreamWriter]:
     async def _new_conn() -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
-        reader, writer = await asyncio.open_connection(HOST, PORT, ssl=True)
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl)
 
         loop = asyncio.get_event_loop()
-        shutdown_cb = functools.partial(_shutdown, writer, loop)
+        shutdown_cb = functools.partial(_shutdown, writer, log_writer, loop)
         try:
             loop.add_signal_handler(signal.SIGINT, shutdown_cb)
         except NotImplementedError:
             # Doh... Windows...
             signal.signal(signal.SIGINT, lambda *_: shutdown_cb())
 
-        await send(writer, 'CAP REQ :twitch.tv/tags\r\n', quiet=quiet)
+        # commands: for USERSTATE, which says whether the bot is a moderator
+        cap_req = 'CAP REQ :twitch.tv/tags twitch.tv/commands\r\n'
+        await send(writer, cap_req, quiet=quiet)
         await send(writer, f'PASS {config.oauth_token}\r\n', quiet=True)
         await send(writer, f'NICK {config.username}\r\n', quiet=quiet)
         await send(writer, f'JOIN #{config.channel}\r\n', quiet=quiet)
@@ -107,6 +146,7 @@ async def connect(
                 else:
                     print('!!!reconnect!!!')
                     reader, writer = await _new_conn()
+                    on_reconnect(writer)
                     continue
 
             yield data
@@ -117,23 +157,97 @@ async def connect(
 # TODO: !tags, only allowed by stream admin / mods????
 
 def dt_str() -> str:
-    dt_now = datetime.datetime.now()
-    return f'[{dt_now.hour:02}:{dt_now.minute:02}]'
+    return CLOCK.dt_str()
 
 
 UNCOLOR_RE = re.compile(r'\033\[[^m]*m')
 
 
+def _report_write_error(fut: concurrent.futures.Future[None]) -> None:
+    # nothing waits on the writes, a failing one would go unnoticed
+    exc = fut.exception()
+    if exc is not None:
+        traceback.print_exception(exc)
+
+
 class LogWriter:
+    """buffer log lines and write them from a background thread
+
+    buffered lines are written every `FLUSH_SECONDS` or once there are
+    `FLUSH_LINES` of them, whichever comes first.
+    """
+    FLUSH_SECONDS = 1
+    FLUSH_LINES = 100
+
     def __init__(self) -> None:
-        self.date = str(datetime.date.today())
+        self.date = CLOCK.today_str()
+        self._buf: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # a single thread so writes stay in order
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._closed = False
+        # only touched from the writer thread
+        self._file: IO[str] | None = None
+        self._file_date = ''
+
+    def _write(self, date: str, s: str) -> None:
+        if self._file is None or date != self._file_date:
+            if self._file is not None:
+                self._file.close()
+            os.makedirs('logs', exist_ok=True)
+            log = os.path.join('logs', f'{date}.log')
+            self._file = open(log, 'a+', encoding='UTF-8')
+            self._file_date = date
+        self._file.write(s)
+        self._file.flush()
+
+    def _close_file(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def flush(self) -> None:
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        if self._buf:
+            s = ''.join(self._buf)
+            self._buf.clear()
+            if self._closed:  # stragglers from handlers still running
+                self._write(self.date, s)
+                self._close_file()
+            else:
+                fut = self._executor.submit(self._write, self.date, s)
+                fut.add_done_callback(_report_write_error)
 
     def write_message(self, msg: str) -> None:
+        date = CLOCK.today_str()
+        if date != self.date:
+            self.flush()  # the buffered lines belong to the previous day
+            self.date = date
+
         uncolored_msg = UNCOLOR_RE.sub('', msg)
-        os.makedirs('logs', exist_ok=True)
-        log = os.path.join('logs', f'{self.date}.log')
-        with open(log, 'a+', encoding='UTF-8') as f:
-            f.write(f'{uncolored_msg}\n')
+        self._buf.append(f'{uncolored_msg}\n')
+        for func in LOG_LINE_HANDLERS:
+            try:
+                func(uncolored_msg)
+            except Exception:
+                traceback.print_exc()
+        if len(self._buf) >= self.FLUSH_LINES:
+            self.flush()
+        elif self._flush_handle is None:
+            loop = asyncio.get_event_loop()
+            self._flush_handle = loop.call_later(
+                self.FLUSH_SECONDS, self.flush,
+            )
+
+    def close(self) -> None:
+        self.flush()
+        self._closed = True
+        fut = self._executor.submit(self._close_file)
+        fut.add_done_callback(_report_write_error)
+        self._executor.shutdown(wait=True)
 
 
 def get_printed_output(config: Config, res: str) -> str | None:
@@ -153,10 +267,9 @@ async def handle_response(
         config: Config,
         msg: Message,
         handler: Callback,
-        writer: asyncio.StreamWriter,
+        send_queue: SendQueue,
+        renderer: RenderQueue,
         log_writer: LogWriter,
-        *,
-        quiet: bool,
 ) -> None:
     try:
         res = await handler(config, msg)
@@ -166,136 +279,287 @@ async def handle_response(
             channel=config.channel,
             msg=f'*** unhandled {type(e).__name__} -- see logs',
         )
-    if res is not None:
+    # a reply identical to one still waiting to be sent is dropped, so it
+    # isn't shown or logged twice either
+    if res is not None and send_queue.put(res):
         printed_output = get_printed_output(config, res)
         if printed_output is not None:
-            print(printed_output)
+            renderer.put(printed_output)
             log_writer.write_message(printed_output)
-        await send(writer, res, quiet=quiet)
+
+
+def _is_moderator(info: dict[str, str]) -> bool:
+    badges = info.get('badges', '')
+    return info.get('mod') == '1' or 'broadcaster/' in badges
+
+
+def _backoff(failures: int) -> float:
+    """how long a background handler waits after failing `failures` times"""
+    start, longest = BACKGROUND_BACKOFF
+    # (the exponent is capped, it is well past `longest` by then anyway)
+    return min(start * 2 ** min(failures - 1, 32), longest)
 
 
 def _start_periodic(
-        config: Config,
-        writer: asyncio.StreamWriter,
-        log_writer: LogWriter,
-        *,
-        quiet: bool,
-) -> None:
-    async def periodic(seconds: int, func: Callback) -> None:
-        msg = Message(
-            msg='placeholder',
-            is_me=False,
-            channel=config.channel,
-            info={'display-name': config.username},
-        )
+        run: Callable[[Callback], Awaitable[None]],
+) -> tuple[Scheduler, list[asyncio.Task[None]]]:
+    async def background(func: Callback) -> None:
+        failures = 0
+
+        async def counting_failures(
+                config: Config,
+                msg: Message,
+        ) -> str | None:
+            nonlocal failures
+            try:
+                ret = await func(config, msg)
+            except Exception:
+                failures += 1
+                raise
+            else:
+                failures = 0
+                return ret
+
         while True:
-            await asyncio.sleep(seconds)
-            await handle_response(
-                config, msg, func, writer, log_writer, quiet=quiet,
-            )
+            await run(counting_failures)
+            if failures:  # don't retry (and report it to chat) in a loop
+                await asyncio.sleep(_backoff(failures))
+
+    scheduler = Scheduler(run)
+    for seconds, jitter, func in PERIODIC_HANDLERS:
+        scheduler.add(seconds, func, jitter=jitter)
+    scheduler.start()
 
     loop = asyncio.get_event_loop()
-    for seconds, func in PERIODIC_HANDLERS:
-        loop.create_task(periodic(seconds, func))
+    tasks = [loop.create_task(background(f)) for f in BACKGROUND_HANDLERS]
+    return scheduler, tasks
+
+
+class InputTemplate(NamedTuple):
+    """a chatter's line, less the time and the message"""
+    badges: str
+    head: str
+    tail: str
+
+
+# the same few hundred chatters post over and over.  a change to any of
+# these (a new color, a new badge) is a new key, the old one ages out
+@functools.lru_cache(maxsize=1024)
+def _input_template(
+        display_name: str,
+        color: tuple[int, int, int],
+        badges: str,
+        is_me: bool,
+        bg_color: tuple[int, int, int] | None,
+) -> InputTemplate:
+    r, g, b = color
+    color_start = f'\033[1m\033[38;2;{r};{g};{b}m'
+
+    if is_me:
+        head = f'{color_start}\033[3m * {display_name}\033[22m '
+        tail = '\033[m'
+    elif bg_color is not None:
+        bg_color_s = '{};{};{}'.format(*bg_color)
+        head = (
+            f'<{color_start}{display_name}\033[m> '
+            f'\033[48;2;{bg_color_s}m'
+        )
+        tail = '\033[m'
+    else:
+        head = f'<{color_start}{display_name}\033[m> '
+        tail = ''
+
+    return InputTemplate(badges_plain_text(badges), head, tail)
 
 
-async def get_printed_input(
+def get_input_template(parsed: Message) -> InputTemplate:
+    return _input_template(
+        parsed.display_name,
+        parsed.color,
+        parsed.info['badges'],
+        parsed.is_me,
+        parsed.bg_color,
+    )
+
+
+def _bits_colorize(parsed: Message, msg_s: str) -> str:
+    if int(parsed.info.get('bits', '0')) % 100 == 69:
+        return colorize(msg_s)
+    else:
+        return msg_s
+
+
+def get_printed_input(
+        parsed: Message,
+        dt: str,
+        template: InputTemplate,
+) -> tuple[str, str]:
+    prefix = f'{dt}{template.badges}{template.head}'
+    msg_s = _bits_colorize(parsed, colorize(parsed.msg))
+    to_print = f'{prefix}{msg_s}{template.tail}'
+    to_log = f'{prefix}{parsed.msg}{template.tail}'
+    return to_print, to_log
+
+
+async def get_printed_images(
         config: Config,
-        msg: str,
-        *,
-        images: bool,
-) -> tuple[str, str] | None:
-    parsed = Message.parse(msg)
-    if parsed:
-        r, g, b = parsed.color
-        color_start = f'\033[1m\033[38;2;{r};{g};{b}m'
+        parsed: Message,
+        dt: str,
+        template: InputTemplate,
+) -> str:
+    # TODO: maybe combine into `Message`?
+    badges = parse_badges(parsed.info['badges'])
+    big = parsed.info.get('msg-id') == 'gigantified-emote-message'
+
+    async def _badges() -> str:
+        await download_all_badges(
+            badges,
+            channel=config.channel,
+            oauth_token=config.oauth_token_token,
+            client_id=config.client_id,
+        )
+        return badges_images(badges)
 
-        badges_s = badges_plain_text(parsed.badges)
-        if images:
-            # TODO: maybe combine into `Message`?
-            badges = parse_badges(parsed.info['badges'])
-            await download_all_badges(
-                parse_badges(parsed.info['badges']),
-                channel=config.channel,
-                oauth_token=config.oauth_token_token,
-                client_id=config.client_id,
-            )
-            badges_s_images = badges_images(badges)
-        else:
-            badges_s_images = badges_s
+    async def _msg() -> str:
+        msg_parsed = await parse_message_parts(
+            msg=parsed,
+            channel=config.channel,
+            oauth_token=config.oauth_token_token,
+            client_id=config.client_id,
+        )
+        return await parsed_to_terminology(msg_parsed, big=big)
 
-        if images:
-            big = parsed.info.get('msg-id') == 'gigantified-emote-message'
-            msg_parsed = await parse_message_parts(
-                msg=parsed,
-                channel=config.channel,
-                oauth_token=config.oauth_token_token,
-                client_id=config.client_id,
-            )
-            msg_s_images = await parsed_to_terminology(msg_parsed, big=big)
-        else:
-            msg_s_images = colorize(parsed.msg)
+    badges_s, msg_s = await asyncio.gather(_badges(), _msg())
+    msg_s = _bits_colorize(parsed, msg_s)
+    return f'{dt}{badges_s}{template.head}{msg_s}{template.tail}'
 
-        if int(parsed.info.get('bits', '0')) % 100 == 69:
-            msg_s_images = colorize(msg_s_images)
 
-        if parsed.is_me:
-            fmt = (
-                f'{dt_str()}'
-                f'{{badges}}'
-                f'{color_start}\033[3m * {parsed.display_name}\033[22m '
-                f'{{msg}}\033[m'
-            )
-        elif parsed.bg_color is not None:
-            bg_color_s = '{};{};{}'.format(*parsed.bg_color)
-            fmt = (
-                f'{dt_str()}'
-                f'{{badges}}'
-                f'<{color_start}{parsed.display_name}\033[m> '
-                f'\033[48;2;{bg_color_s}m{{msg}}\033[m'
-            )
-        else:
-            fmt = (
-                f'{dt_str()}'
-                f'{{badges}}'
-                f'<{color_start}{parsed.display_name}\033[m> '
-                f'{{msg}}'
-            )
+def _shed_key(handler: Callback, msg: Message) -> Hashable | None:
+    # a user repeating a command while it waits is only answered once
+    # bits and channel points are paid for though, never shed those
+    if 'custom-reward-id' in msg.info or msg.info.get('bits', '0') != '0':
+        return None
+    else:
+        return (handler, msg.name_key, msg.msg)
 
-        to_print = fmt.format(badges=badges_s_images, msg=msg_s_images)
-        to_log = fmt.format(badges=badges_s, msg=parsed.msg)
-        return to_print, to_log
 
-    return None
+async def amain(
+        config: Config,
+        *,
+        quiet: bool,
+        images: bool,
+        host: str = HOST,
+        port: int = PORT,
+        ssl: bool = True,
+        stats: ReplayStats | None = None,
+        executor: HandlerExecutor | None = None,
+        send_queue: SendQueue | None = None,
+        offline: bool = False,
+) -> None:
+    if executor is None:
+        executor = HandlerExecutor()
+    if send_queue is None:
+        send_queue = SendQueue()
 
+    async with client_session(offline=offline), database():
+        if images:
+            budget = config.image_cache_mb * 1024 * 1024
+            await asyncio.to_thread(image_cache.load, budget=budget)
 
-async def amain(config: Config, *, quiet: bool, images: bool) -> None:
-    log_writer = LogWriter()
-    line_iter, writer = await connect(config, quiet=quiet)
+        log_writer = LogWriter()
+        renderer = RenderQueue()
+        writer: asyncio.StreamWriter
 
-    _start_periodic(config, writer, log_writer, quiet=quiet)
+        def on_reconnect(new_writer: asyncio.StreamWriter) -> None:
+            nonlocal writer
+            writer = new_writer
 
-    async for data in line_iter:
-        msg = data.decode('UTF-8', errors='backslashreplace')
+        async def send_current(line: str) -> None:
+            await send(writer, line, quiet=quiet)
+
+        periodic_msg = Message(
+            msg='placeholder',
+            is_me=False,
+            channel=config.channel,
+            info={'display-name': config.username},
+        )
 
-        input_ret = await get_printed_input(config, msg, images=images)
-        if input_ret is not None:
-            to_print, to_log = input_ret
-            print(to_print)
-            log_writer.write_message(to_log)
+        async def run_handler(
+                func: Callback,
+                msg: Message = periodic_msg,
+        ) -> None:
+            await handle_response(
+                config, msg, func, send_queue, renderer, log_writer,
+            )
 
-        maybe_handler_match = get_handler(msg)
-        if maybe_handler_match is not None:
-            handler, match = maybe_handler_match
-            coro = handle_response(
-                config, match, handler, writer, log_writer, quiet=quiet,
+        scheduler: Scheduler | None = None
+        background: list[asyncio.Task[None]] = []
+        try:
+            line_iter, writer = await connect(
+                config, log_writer,
+                host=host, port=port, ssl=ssl, quiet=quiet,
+                on_reconnect=on_reconnect,
             )
-            asyncio.get_event_loop().create_task(coro)
-        elif msg.startswith('PING '):
-            _, _, rest = msg.partition(' ')
-            await send(writer, f'PONG {rest.rstrip()}\r\n', quiet=quiet)
-        elif not quiet:
-            print(f'UNHANDLED: {msg}', end='')
+
+            send_queue.start(send_current)
+            renderer.start()
+            scheduler, background = _start_periodic(run_handler)
+
+            async for data in line_iter:
+                msg = data.decode('UTF-8', errors='backslashreplace')
+
+                # parse once: display, logging and dispatch share the result
+                parsed = Message.parse(msg)
+                if parsed is not None:
+                    dt = dt_str()
+                    template = get_input_template(parsed)
+                    to_print, to_log = get_printed_input(parsed, dt, template)
+                    log_writer.write_message(to_log)
+                    if images:
+                        renderer.put_render(
+                            get_printed_images(config, parsed, dt, template),
+                            fallback=to_print,
+                        )
+                    else:
+                        renderer.put(to_print)
+
+                    handler = get_handler(parsed)
+                    if handler is not None:
+                        run: Callable[[], Awaitable[None]]
+                        run = functools.partial(run_handler, handler, parsed)
+                        if stats is not None:
+                            run = stats.timed(run)
+                        key = _shed_key(handler, parsed)
+                        executor.submit(handler, run, key=key)
+                    elif not quiet:
+                        print(f'UNHANDLED: {msg}', end='')
+                elif msg.startswith('PING '):
+                    _, _, rest = msg.partition(' ')
+                    pong = f'PONG {rest.rstrip()}\r\n'
+                    send_queue.put(pong)
+                elif userstate_match := USERSTATE_RE.match(msg):
+                    info = parse_tags(userstate_match['info'])
+                    send_queue.set_moderator(_is_moderator(info))
+                elif not quiet and not IGNORED_RE.match(msg):
+                    print(f'UNHANDLED: {msg}', end='')
+        finally:
+            await executor.stop()
+            if not quiet:
+                print(executor.report(), file=sys.stderr)
+            for task in background:
+                task.cancel()
+            if scheduler is not None:
+                await scheduler.stop()
+                if not quiet and scheduler.jobs:
+                    print(scheduler.report(), file=sys.stderr)
+            await send_queue.stop()
+            if not quiet:
+                print(send_queue.report(), file=sys.stderr)
+            await renderer.stop()
+            if images and not quiet:
+                print(renderer.report(), file=sys.stderr)
+                print(image_cache.get_cache().report(), file=sys.stderr)
+            log_writer.close()
 
 
 async def chat_message_test(
@@ -307,16 +571,18 @@ async def chat_message_test(
         user: str,
 ) -> None:
     line = get_fake_msg(config, msg, bits=bits, mod=mod, user=user)
+    parsed = Message.parse(line)
+    assert parsed is not None
+
+    async with client_session(), database():
+        template = get_input_template(parsed)
+        to_print, _ = get_printed_input(parsed, dt_str(), template)
+        print(to_print)
 
-    input_ret = await get_printed_input(config, line, images=False)
-    assert input_ret is not None
-    to_print, _ = input_ret
-    print(to_print)
+        handler = get_handler(parsed)
+        result = None if handler is None else await handler(config, parsed)
 
-    maybe_handler_match = get_handler(line)
-    if maybe_handler_match is not None:
-        handler, match = maybe_handler_match
-        result = await handler(config, match)
+    if handler is not None:
         if result is not None:
             printed_output = get_printed_output(config, result)
             if printed_output is not None:
@@ -329,6 +595,58 @@ async def chat_message_test(
         print('<<no handler>>')
 
 
+async def replay(
+        config: Config,
+        filename: str,
+        *,
+        rate: float | None,
+        quiet: bool,
+        images: bool,
+) -> None:
+    lines = load_transcript(filename)
+    # the handlers are real, keep what they write and fetch away from the
+    # real bot's files and from the network
+    with sandbox():
+        stats = ReplayStats()
+        executor = HandlerExecutor()
+        send_queue = SendQueue()
+        async with ReplayServer(lines, rate=rate) as server:
+            loop = asyncio.get_event_loop()
+            monitor = loop.create_task(stats.monitor_loop_lag())
+            bot = loop.create_task(
+                amain(
+                    config,
+                    quiet=quiet,
+                    images=images,
+                    host=REPLAY_HOST,
+                    port=server.port,
+                    ssl=False,
+                    stats=stats,
+                    executor=executor,
+                    send_queue=send_queue,
+                    offline=True,
+                ),
+            )
+            await asyncio.wait(
+                (bot, server.done),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if bot.done():  # the bot crashed before the replay finished
+                monitor.cancel()
+                return bot.result()
+
+            elapsed = server.done.result()
+            await executor.join()
+            bot.cancel()
+            monitor.cancel()
+            # let it close its files before the directory goes away
+            await asyncio.gather(bot, monitor, return_exceptions=True)
+
+        stats.report(
+            len(lines), elapsed, f'{executor.report()}\n{send_queue.report()}',
+        )
+
+
 def main() -> int:
     parser = argparse.ArgumentParser()
     parser.add_argument('--config', default='config.json')
@@ -338,6 +656,18 @@ def main() -> int:
     parser.add_argument('--user', default='username')
     parser.add_argument('--bits', type=int, default=0)
     parser.add_argument('--mod', action='store_true')
+    parser.add_argument(
+        '--replay', metavar='FILE',
+        help='play back a recorded irc transcript against a local server',
+    )
+    rate_mutex = parser.add_mutually_exclusive_group()
+    rate_mutex.add_argument(
+        '--rate', type=float, help='replay at N lines per second',
+    )
+    rate_mutex.add_argument(
+        '--max', action='store_true',
+        help='replay as fast as possible (the default)',
+    )
     args = parser.parse_args()
 
     quiet = not args.verbose
@@ -355,6 +685,16 @@ def main() -> int:
                 user=args.user,
             ),
         )
+    elif args.replay:
+        asyncio.run(
+            replay(
+                config,
+                args.replay,
+                rate=args.rate,
+                quiet=quiet,
+                images=args.images,
+            ),
+        )
     else:
         with contextlib.suppress(KeyboardInterrupt):
             asyncio.run(amain(config, quiet=quiet, images=args.images))
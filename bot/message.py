@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import functools
 import hashlib
 import re
 import struct
@@ -11,6 +12,28 @@ MSG_RE = re.compile(
     'PRIVMSG #(?P<channel>[^ ]+) '
     ':(?P<msg>[^\r]+)',
 )
+TAG_ESCAPE_RE = re.compile(r'\\(.?)')
+TAG_ESCAPES = {':': ';', 's': ' ', 'r': '\r', 'n': '\n'}
+
+
+def _unescape_tag_cb(match: re.Match[str]) -> str:
+    return TAG_ESCAPES.get(match[1], match[1])
+
+
+def unescape_tag(s: str) -> str:
+    # https://ircv3.net/specs/extensions/message-tags#escaping-values
+    if '\\' not in s:  # the overwhelmingly common case
+        return s
+    else:
+        return TAG_ESCAPE_RE.sub(_unescape_tag_cb, s)
+
+
+def parse_tags(s: str) -> dict[str, str]:
+    info = {}
+    for part in s.split(';'):
+        k, _, v = part.partition('=')
+        info[k] = unescape_tag(v)
+    return info
 
 
 def parse_color(s: str) -> tuple[int, int, int]:
@@ -28,6 +51,28 @@ def _gen_color(name: str) -> tuple[int, int, int]:
     return r, g, b
 
 
+# the same handful of chatters / badge combinations show up over and over so
+# the derived values are cached per distinct tag value rather than per message
+
+
+@functools.lru_cache(maxsize=1024)
+def _color(color: str, display_name: str) -> tuple[int, int, int]:
+    if color:
+        return parse_color(color)
+    else:
+        return _gen_color(display_name)
+
+
+@functools.lru_cache(maxsize=256)
+def _badges(badges: str) -> tuple[str, ...]:
+    return tuple(badges.split(','))
+
+
+@functools.lru_cache(maxsize=256)
+def _badge_names(badges: str) -> frozenset[str]:
+    return frozenset(badge.partition('/')[0] for badge in _badges(badges))
+
+
 class Message(NamedTuple):
     msg: str
     is_me: bool
@@ -36,7 +81,7 @@ class Message(NamedTuple):
 
     @property
     def badges(self) -> tuple[str, ...]:
-        return tuple(self.info['badges'].split(','))
+        return _badges(self.info['badges'])
 
     @property
     def display_name(self) -> str:
@@ -49,10 +94,7 @@ class Message(NamedTuple):
 
     @property
     def color(self) -> tuple[int, int, int]:
-        if self.info['color']:
-            return parse_color(self.info['color'])
-        else:
-            return _gen_color(self.display_name)
+        return _color(self.info['color'], self.display_name)
 
     @property
     def bg_color(self) -> tuple[int, int, int] | None:
@@ -73,12 +115,12 @@ class Message(NamedTuple):
 
     @property
     def is_moderator(self) -> bool:
-        return any(badge.startswith('moderator/') for badge in self.badges)
+        return 'moderator' in _badge_names(self.info['badges'])
 
     @property
     def is_subscriber(self) -> bool:
-        possible = ('founder/', 'subscriber/')
-        return any(badge.startswith(possible) for badge in self.badges)
+        names = _badge_names(self.info['badges'])
+        return 'founder' in names or 'subscriber' in names
 
     @classmethod
     def parse(cls, msg: str) -> Message | None:
@@ -90,15 +132,11 @@ class Message(NamedTuple):
             else:
                 msg = match['msg']
 
-            info = {}
-            for part in match['info'].split(';'):
-                k, v = part.split('=', 1)
-                info[k] = v
             return cls(
                 msg=msg,
                 is_me=is_me,
                 channel=match['channel'],
-                info=info,
+                info=parse_tags(match['info']),
             )
         else:
             return None
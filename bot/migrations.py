@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import aiosqlite
+
+# each entry is one schema version, applied in order and never edited once
+# released -- change the schema by appending a new one
+MIGRATIONS: tuple[tuple[str, ...], ...] = (
+    # 1: the tables plugins used to create on every call (so: IF NOT EXISTS)
+    (
+        'CREATE TABLE IF NOT EXISTS giveaway ('
+        '    active BIT NOT NULL,'
+        '    PRIMARY KEY (active)'
+        ')',
+        'CREATE TABLE IF NOT EXISTS giveaway_users ('
+        '    user TEXT NOT NULL,'
+        '    PRIMARY KEY (user)'
+        ')',
+        'CREATE TABLE IF NOT EXISTS motd ('
+        '   user TEXT NOT NULL,'
+        '   msg TEXT NOT NULL,'
+        '   points INT NOT NULL,'
+        '   timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        ')',
+        'CREATE TABLE IF NOT EXISTS today ('
+        '   msg TEXT NOT NULL,'
+        '   timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        ')',
+        'CREATE TABLE IF NOT EXISTS vim_bits ('
+        '    user TEXT NOT NULL,'
+        '    bits INT NOT NULL,'
+        '    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        ')',
+        'CREATE TABLE IF NOT EXISTS vim_bits_disabled ('
+        '    user TEXT NOT NULL,'
+        '    bits INT NOT NULL,'
+        '    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+        ')',
+        'CREATE TABLE IF NOT EXISTS vim_time_left ('
+        '    timestamp TIMESTAMP NOT NULL'
+        ')',
+        'CREATE TABLE IF NOT EXISTS vim_enabled ('
+        '    enabled INT NOT NULL'
+        ')',
+    ),
+    # 2: `!motd` counts and vim bits ranks look rows up by these
+    (
+        'CREATE INDEX motd_msg_idx ON motd (msg)',
+        'CREATE INDEX vim_bits_user_idx ON vim_bits (user, bits)',
+    ),
+    # 3: helix responses, kept across restarts
+    (
+        'CREATE TABLE helix_cache ('
+        '    url TEXT NOT NULL,'
+        '    fetched REAL NOT NULL,'
+        '    etag TEXT,'
+        '    data TEXT NOT NULL,'
+        '    PRIMARY KEY (url)'
+        ')',
+    ),
+    # 4: the vim bits leaderboard groups by LOWER(user), which 2's index
+    # can't be used for
+    (
+        'DROP INDEX vim_bits_user_idx',
+        'CREATE INDEX vim_bits_lower_user_idx ON vim_bits (LOWER(user))',
+    ),
+)
+
+
+async def get_version(db: aiosqlite.Connection) -> int:
+    query = 'SELECT MAX(version) FROM schema_version'
+    async with db.execute(query) as cursor:
+        row = await cursor.fetchone()
+        assert row is not None
+        version, = row
+        return version or 0
+
+
+async def migrate(db: aiosqlite.Connection) -> int:
+    """bring the schema up to date, returns the new version"""
+    await db.execute(
+        'CREATE TABLE IF NOT EXISTS schema_version ('
+        '    version INT NOT NULL,'
+        '    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,'
+        '    PRIMARY KEY (version)'
+        ')',
+    )
+
+    version = await get_version(db)
+    for version, statements in enumerate(
+            MIGRATIONS[version:], start=version + 1,
+    ):
+        # all of a version or none of it: sqlite3 doesn't begin a
+        # transaction for DDL by itself
+        await db.execute('BEGIN')
+        try:
+            for statement in statements:
+                await db.execute(statement)
+            query = 'INSERT INTO schema_version (version) VALUES (?)'
+            await db.execute(query, (version,))
+        except BaseException:
+            await db.rollback()
+            raise
+        await db.commit()
+
+    return version
@@ -0,0 +1,163 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import heapq
+import time
+import traceback
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+# twitch allows 20 PRIVMSGs per 30 seconds, or 100 if the bot is a moderator
+# (or the broadcaster) of the channel -- going over gets the bot muted
+RATE = (20, 30.)
+RATE_MODERATOR = (100, 30.)
+
+PRIORITY_PONG = 0
+PRIORITY_MSG = 1
+
+
+class TokenBucket:
+    """at most `capacity` takes in any `per` second window
+
+    each token comes back exactly `per` seconds after it is spent (rather
+    than trickling back continuously) so a full burst can't be followed by
+    another one inside the same window.
+    """
+
+    def __init__(
+            self,
+            capacity: int,
+            per: float,
+            *,
+            clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.capacity = capacity
+        self.per = per
+        self._clock = clock
+        self._spent: collections.deque[float] = collections.deque()
+
+    def _expire(self, now: float) -> None:
+        while self._spent and self._spent[0] + self.per <= now:
+            self._spent.popleft()
+
+    def delay(self) -> float:
+        """seconds until a token is available (0 if one is now)"""
+        now = self._clock()
+        self._expire(now)
+        if len(self._spent) < self.capacity:
+            return 0
+        else:
+            # when the capacity shrinks there may be extra to wait out
+            excess = len(self._spent) - self.capacity
+            return self._spent[excess] + self.per - now
+
+    def take(self) -> None:
+        assert self.delay() == 0, 'no tokens available'
+        self._spent.append(self._clock())
+
+
+class SendQueue:
+    """the only writer to the irc connection
+
+    lines are written one at a time from a single task: PONGs first, then
+    everything else in order.  PRIVMSGs are held to twitch's rate limit and
+    an identical PRIVMSG which is still waiting is only sent once.
+    """
+
+    def __init__(self) -> None:
+        self.bucket = TokenBucket(*RATE)
+        # (priority, tiebreak, line, enqueued at)
+        self._heap: list[tuple[int, int, str, float]] = []
+        self._pending: set[str] = set()
+        self._seq = 0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+        self.sent = 0
+        self.coalesced = 0
+        self.max_queued = 0
+        self.wait_total = 0.
+        self.wait_max = 0.
+
+    @property
+    def queued(self) -> int:
+        return len(self._heap)
+
+    def set_moderator(self, moderator: bool) -> None:
+        capacity, _ = RATE_MODERATOR if moderator else RATE
+        self.bucket.capacity = capacity
+
+    def put(self, line: str) -> bool:
+        """returns whether `line` was queued (else it is already waiting)"""
+        if line.startswith('PONG '):
+            priority = PRIORITY_PONG
+        elif line in self._pending:
+            self.coalesced += 1
+            return False
+        else:
+            priority = PRIORITY_MSG
+            self._pending.add(line)
+
+        item = (priority, self._seq, line, time.monotonic())
+        heapq.heappush(self._heap, item)
+        self._seq += 1
+        self.max_queued = max(self.max_queued, len(self._heap))
+        self._wakeup.set()
+        return True
+
+    async def _wait(self, timeout: float | None = None) -> None:
+        self._wakeup.clear()
+        # not `wait_for`: it drops a cancellation that arrives as it is woken,
+        # and then `stop()` waits out the rate limit
+        wakeup = asyncio.ensure_future(self._wakeup.wait())
+        try:
+            await asyncio.wait((wakeup,), timeout=timeout)
+        finally:
+            wakeup.cancel()
+
+    async def _run(self, send: Callable[[str], Awaitable[None]]) -> None:
+        while True:
+            if not self._heap:
+                await self._wait()
+                continue
+
+            _, _, line, enqueued = self._heap[0]
+            if line.startswith('PRIVMSG '):
+                delay = self.bucket.delay()
+                if delay > 0:
+                    # woken early if a PONG jumps the line
+                    await self._wait(delay)
+                    continue
+                self.bucket.take()
+
+            heapq.heappop(self._heap)
+            self._pending.discard(line)
+
+            wait = time.monotonic() - enqueued
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            self.sent += 1
+            try:
+                await send(line)
+            except Exception:  # a dead connection is reconnected elsewhere
+                traceback.print_exc()
+
+    def start(self, send: Callable[[str], Awaitable[None]]) -> None:
+        assert self._task is None, 'already started'
+        loop = asyncio.get_running_loop()
+        self._task = loop.create_task(self._run(send))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def report(self) -> str:
+        avg = self.wait_total / self.sent if self.sent else 0
+        return (
+            f'send queue: sent={self.sent} queued={self.queued} '
+            f'max queued={self.max_queued} coalesced={self.coalesced} '
+            f'wait avg={avg * 1000:.2f}ms max={self.wait_max * 1000:.2f}ms'
+        )
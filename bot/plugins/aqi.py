@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import re
 
-import aiohttp
-
 from bot.config import Config
 from bot.data import command
+from bot.data import concurrency_limit
 from bot.data import esc
 from bot.data import format_msg
+from bot.http_session import get_session
 from bot.message import Message
 
 
@@ -15,6 +15,7 @@ ZIP_CODE_RE = re.compile(r'^\d{5}$', re.ASCII)
 
 
 @command('!aqi', secret=True)
+@concurrency_limit(2)
 async def cmd_aqi(config: Config, msg: Message) -> str:
     _, _, rest = msg.msg.partition(' ')
     if rest:
@@ -30,22 +31,21 @@ async def cmd_aqi(config: Config, msg: Message) -> str:
         'API_KEY': config.airnow_api_key,
     }
     url = 'https://www.airnowapi.org/aq/observation/zipCode/current/'
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, params=params) as resp:
-            json_resp = await resp.json()
-            pm_25 = [d for d in json_resp if d['ParameterName'] == 'PM2.5']
-            if not pm_25:
-                return format_msg(
-                    msg,
-                    'No PM2.5 info -- is this a US zip code?',
-                )
-            else:
-                data, = pm_25
-                return format_msg(
-                    msg,
-                    f'Current AQI ({esc(data["ParameterName"])}) in '
-                    f'{esc(data["ReportingArea"])}, '
-                    f'{esc(data["StateCode"])}: '
-                    f'{esc(str(data["AQI"]))} '
-                    f'({esc(data["Category"]["Name"])})',
-                )
+    async with get_session().get(url, params=params) as resp:
+        json_resp = await resp.json()
+        pm_25 = [d for d in json_resp if d['ParameterName'] == 'PM2.5']
+        if not pm_25:
+            return format_msg(
+                msg,
+                'No PM2.5 info -- is this a US zip code?',
+            )
+        else:
+            data, = pm_25
+            return format_msg(
+                msg,
+                f'Current AQI ({esc(data["ParameterName"])}) in '
+                f'{esc(data["ReportingArea"])}, '
+                f'{esc(data["StateCode"])}: '
+                f'{esc(str(data["AQI"]))} '
+                f'({esc(data["Category"]["Name"])})',
+            )
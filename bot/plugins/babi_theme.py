@@ -1,11 +1,11 @@
 from __future__ import annotations
 
-import asyncio
 import io
 import json
 import os.path
 import plistlib
 import re
+import signal
 import uuid
 from typing import Any
 
@@ -18,7 +18,10 @@ from bot.data import channel_points_handler
 from bot.data import command
 from bot.data import esc
 from bot.data import format_msg
+from bot.http_session import get_session
 from bot.message import Message
+from bot.proc import signal_all
+from bot.util import atomic_symlink
 
 ALLOWED_URL_PREFIXES = (
     'https://gist.github.com/',
@@ -163,13 +166,13 @@ async def _load_theme(url: str) -> dict[str, Any]:
         url = url.replace('/blob/', '/raw/')
 
     try:
-        async with aiohttp.ClientSession(
+        async with get_session().get(
+                url,
                 raise_for_status=True,
-                read_timeout=2,
-        ) as session:
-            async with session.get(url) as resp:
-                data = await resp.read()
-    except aiohttp.ClientError:
+                timeout=aiohttp.ClientTimeout(total=10, sock_read=2),
+        ) as resp:
+            data = await resp.read()
+    except (aiohttp.ClientError, TimeoutError):
         raise ThemeError('error: could not download url!')
 
     for strategy in STRATEGIES:
@@ -212,14 +215,10 @@ async def change_theme(config: Config, msg: Message) -> str:
     os.makedirs(themedir, exist_ok=True)
 
     dest = os.path.join(themedir, 'theme.json')
-    proc = await asyncio.create_subprocess_exec('ln', '-sf', theme_file, dest)
-    await proc.communicate()
-    assert proc.returncode == 0
-
-    proc = await asyncio.create_subprocess_exec('pkill', '-USR1', 'babi')
-    await proc.communicate()
-    # ignore the return code, if there are no editors running it'll be `1`
-    # assert proc.returncode == 0
+    atomic_symlink(theme_file, dest)
+
+    # it's fine if there are no editors running
+    signal_all('babi', signal.SIGUSR1)
 
     return format_msg(msg, 'theme updated!')
 
@@ -1,24 +1,34 @@
 from __future__ import annotations
 
+import asyncio
 import collections
+import contextlib
 import datetime
-import functools
 import json
 import os
 import re
-import urllib.request
+import sqlite3
+import threading
 from collections import Counter
+from collections.abc import Iterable
 from collections.abc import Mapping
 from collections.abc import Sequence
 from re import Pattern
 from typing import Any
 
+import aiohttp
+import async_lru
+
+from bot.clock import CLOCK
 from bot.config import Config
 from bot.data import command
+from bot.data import concurrency_limit
 from bot.data import esc
 from bot.data import format_msg
+from bot.data import log_line_handler
+from bot.http_session import get_session
 from bot.message import Message
-from bot.ranking import tied_rank
+from bot.ranking import Leaderboard
 
 CHAT_ALIASES = {
     'jast_lucy': 'snipsyfox',
@@ -36,71 +46,286 @@ CHAT_LOG_RE = re.compile(
 )
 BONKER_RE = re.compile(r'^\[[^]]+\][^<*]*<(?P<chat_user>[^>]+)> !bonk\b')
 BONKED_RE = re.compile(r'^\[[^]]+\][^<*]*<[^>]+> !bonk @?(?P<chat_user>\w+)')
+LINE_TYPES = {CHAT_LOG_RE: 'chat', BONKER_RE: 'bonker', BONKED_RE: 'bonked'}
 
 
 def _alias(user: str) -> str:
     return CHAT_ALIASES.get(user, user)
 
 
-@functools.cache
-def _counts_per_file(filename: str, reg: Pattern[str]) -> Mapping[str, int]:
-    counts: Counter[str] = collections.Counter()
-    with open(filename, encoding='utf8') as f:
-        for line in f:
+def _line_counts(lines: Iterable[str]) -> dict[str, Counter[str]]:
+    """un-aliased per-user counts of each line type"""
+    counts: dict[str, Counter[str]] = collections.defaultdict(Counter)
+    for line in lines:
+        for reg, line_type in LINE_TYPES.items():
             match = reg.match(line)
             if match is None:
-                assert reg is not CHAT_LOG_RE
+                assert reg is not CHAT_LOG_RE, line
                 continue
             user = match['chat_user'] or match['action_user']
             assert user, line
-
-            counts[_alias(user.lower())] += 1
+            counts[line_type][user.lower()] += 1
     return counts
 
 
-def _chat_rank_counts(reg: Pattern[str]) -> Counter[str]:
-    total: Counter[str] = collections.Counter()
-    for filename in os.listdir('logs'):
-        full_filename = os.path.join('logs', filename)
-        if filename != f'{datetime.date.today()}.log':
-            total.update(_counts_per_file(full_filename, reg))
-        else:
-            # don't use the cached version for today's logs
-            total.update(_counts_per_file.__wrapped__(full_filename, reg))
-    return total
+def _log_filenames(logs: str) -> list[str]:
+    # logs/ is only made when the first line is written
+    try:
+        return sorted(os.listdir(logs))
+    except FileNotFoundError:
+        return []
+
+
+class LogIndex:
+    """per-user line counts: the history of `logs/` plus live chat
+
+    the history is persisted per-day and per-user: past days are only ever
+    read once and a log that was still being written is picked up where it
+    left off.  lines logged by this process are counted as they happen (see
+    `add_line`) so once the history is loaded there is no more file io.
+
+    users are stored un-aliased so changes to `CHAT_ALIASES` apply to old
+    data as well.
+    """
+
+    def __init__(self, db: str, logs: str = 'logs') -> None:
+        self.db = db
+        self.logs = logs
+        self._lock = threading.Lock()
+        self._tables_created = False
+        self.history_loaded = False
+        # log filename => byte offset where live counting took over
+        self._live_start: dict[str, int] = {}
+        # log filename => un-aliased chat counts, for lines counted live
+        self._live_chat: dict[str, Counter[str]] = {}
+        self._totals = {
+            line_type: Leaderboard() for line_type in LINE_TYPES.values()
+        }
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.db)
+        if not self._tables_created:
+            self._create_tables(db)
+            self._tables_created = True
+        return db
+
+    def _create_tables(self, db: sqlite3.Connection) -> None:
+        # not part of `bot.migrations`: `chatrank.db` is a cache derived from
+        # `logs/` (deleting it only costs a re-scan) and is used from threads
+        # with plain sqlite3, so changing its schema means bumping the
+        # filename rather than migrating it
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS files ('
+            '    filename TEXT NOT NULL PRIMARY KEY,'
+            '    offset INT NOT NULL,'
+            '    complete INT NOT NULL'
+            ')',
+        )
+        db.execute(
+            'CREATE TABLE IF NOT EXISTS counts ('
+            '    filename TEXT NOT NULL,'
+            '    line_type TEXT NOT NULL,'
+            '    user TEXT NOT NULL,'
+            '    n INT NOT NULL,'
+            '    PRIMARY KEY (filename, line_type, user)'
+            ')',
+        )
+        db.execute(
+            'CREATE INDEX IF NOT EXISTS counts_user_idx '
+            'ON counts (line_type, user)',
+        )
+
+    def _index_file(
+            self,
+            db: sqlite3.Connection,
+            filename: str,
+            offset: int,
+            *,
+            end: int | None,
+            complete: bool,
+    ) -> dict[str, Counter[str]]:
+        with open(os.path.join(self.logs, filename), 'rb') as f:
+            f.seek(offset)
+            if end is None:
+                data = f.read()
+            else:
+                data = f.read(end - offset)
+        # only index complete lines, the rest is picked up next time
+        data = data[:data.rfind(b'\n') + 1]
+
+        counts = _line_counts(data.decode('UTF-8').split('\n')[:-1])
+
+        query = (
+            'INSERT INTO counts VALUES (?, ?, ?, ?) '
+            'ON CONFLICT DO UPDATE SET n = n + excluded.n'
+        )
+        for line_type, line_type_counts in counts.items():
+            db.executemany(
+                query,
+                (
+                    (filename, line_type, user, n)
+                    for user, n in line_type_counts.items()
+                ),
+            )
+        db.execute(
+            'INSERT OR REPLACE INTO files VALUES (?, ?, ?)',
+            (filename, offset + len(data), complete),
+        )
+        return counts
+
+    def load_history(self) -> dict[str, Counter[str]]:
+        """index `logs/` and return the historical counts (once)
+
+        this can be slow so it is run in a thread -- the counts it returns
+        are merged with `add` back on the event loop.  logs are only read up
+        to the point where live counting took over.
+        """
+        with self._lock:
+            if self.history_loaded:
+                return {}
+            with contextlib.closing(self._connect()) as db:
+                history = self._load_history(db)
+            self.history_loaded = True
+            return history
+
+    def _load_history(
+            self,
+            db: sqlite3.Connection,
+    ) -> dict[str, Counter[str]]:
+        history: dict[str, Counter[str]]
+        history = collections.defaultdict(Counter)
+        query = 'SELECT line_type, user, SUM(n) FROM counts GROUP BY 1, 2'
+        for line_type, user, n in db.execute(query):
+            history[line_type][user] += n
+
+        today = f'{CLOCK.today_str()}.log'
+        query = 'SELECT filename, offset, complete FROM files'
+        indexed = {
+            filename: (offset, complete)
+            for filename, offset, complete in db.execute(query)
+        }
+        for filename in _log_filenames(self.logs):
+            offset, complete = indexed.get(filename, (0, False))
+            end = self._live_start.get(filename)
+            if complete or (end is not None and end <= offset):
+                continue
+            with db:
+                counts = self._index_file(
+                    db, filename, offset,
+                    end=end,
+                    complete=filename != today and end is None,
+                )
+            for line_type, line_type_counts in counts.items():
+                history[line_type].update(line_type_counts)
+
+        return history
+
+    def add(self, counts: Mapping[str, Counter[str]]) -> None:
+        for line_type, line_type_counts in counts.items():
+            for user, n in line_type_counts.items():
+                self._totals[line_type].increment(_alias(user), n)
+
+    def start_live(self) -> None:
+        """lines logged from now on will be passed to `add_line`"""
+        filename = f'{CLOCK.today_str()}.log'
+        try:
+            self._live_start[filename] = os.path.getsize(
+                os.path.join(self.logs, filename),
+            )
+        except OSError:
+            self._live_start[filename] = 0
+
+    def add_line(self, line: str) -> None:
+        filename = f'{CLOCK.today_str()}.log'
+        if filename not in self._live_start:
+            self.start_live()  # the date rolled over
+        counts = _line_counts((line,))
+        self._live_chat.setdefault(filename, Counter()).update(counts['chat'])
+        self.add(counts)
+
+    def daily_chat_counts(self, user: str) -> Counter[str]:
+        """chat lines per log filename for (aliased) `user`
+
+        this queries the db so it is run in a thread.
+        """
+        users = [user, *(k for k, v in CHAT_ALIASES.items() if v == user)]
+
+        ret: Counter[str] = collections.Counter()
+        query = (
+            f'SELECT filename, SUM(n) FROM counts '
+            f'WHERE line_type = ? AND user IN ({", ".join("?" * len(users))}) '
+            f'GROUP BY filename'
+        )
+        with contextlib.closing(self._connect()) as db:
+            for filename, n in db.execute(query, ('chat', *users)):
+                ret[filename] += n
+        # copied as the event loop may add a day meanwhile
+        for filename, counts in tuple(self._live_chat.items()):
+            for raw_user in users:
+                ret[filename] += counts[raw_user]
+        return +ret  # drop the zeros
+
+    def leaderboard(self, reg: Pattern[str]) -> Leaderboard:
+        return self._totals[LINE_TYPES[reg]]
+
+
+# created on first use -- normally when the first line is logged
+_LOG_INDEX: LogIndex | None = None
+
+
+def _log_index() -> LogIndex:
+    global _LOG_INDEX
+    if _LOG_INDEX is None:
+        _LOG_INDEX = LogIndex('chatrank.db')
+        _LOG_INDEX.start_live()
+    return _LOG_INDEX
+
+
+@log_line_handler
+def _add_log_line(line: str) -> None:
+    _log_index().add_line(line)
+
+
+async def _update_log_index() -> None:
+    index = _log_index()
+    if not index.history_loaded:
+        index.add(await asyncio.to_thread(index.load_history))
+
+
+def _leaderboard(reg: Pattern[str]) -> Leaderboard:
+    return _log_index().leaderboard(reg)
 
 
 def _user_rank_by_line_type(
         username: str, reg: Pattern[str],
 ) -> tuple[int, int] | None:
-    total = _chat_rank_counts(reg)
-    target_username = username.lower()
-    for rank, (count, users) in tied_rank(total.most_common()):
-        for username, _ in users:
-            if target_username == username:
-                return rank, count
-    else:
-        return None
+    return _leaderboard(reg).rank(username.lower())
 
 
 def _top_n_rank_by_line_type(reg: Pattern[str], n: int = 10) -> list[str]:
-    total = _chat_rank_counts(reg)
-    user_list = []
-    for rank, (count, users) in tied_rank(total.most_common(n)):
-        usernames = ', '.join(username for username, _ in users)
-        user_list.append(f'{rank}. {usernames} ({count})')
-    return user_list
+    return [
+        f'{rank}. {", ".join(users)} ({count})'
+        for rank, count, users in _leaderboard(reg).top(n)
+    ]
+
+
+# fixed once there is a log
+_LOG_START_DATE: str | None = None
 
 
-@functools.lru_cache(maxsize=1)
 def _log_start_date() -> str:
-    logs_start = min(os.listdir('logs'))
-    logs_start, _, _ = logs_start.partition('.')
-    return logs_start
+    global _LOG_START_DATE
+    if _LOG_START_DATE is None:
+        filenames = _log_filenames('logs')
+        if not filenames:  # nothing logged yet
+            return CLOCK.today_str()
+        _LOG_START_DATE, _, _ = filenames[0].partition('.')
+    return _LOG_START_DATE
 
 
 @command('!chatrank')
 async def cmd_chatrank(config: Config, msg: Message) -> str:
+    await _update_log_index()
     # TODO: handle display name
     user = msg.optional_user_arg.lower()
     ret = _user_rank_by_line_type(user, CHAT_LOG_RE)
@@ -117,12 +342,14 @@ async def cmd_chatrank(config: Config, msg: Message) -> str:
 
 @command('!top10chat')
 async def cmd_top_10_chat(config: Config, msg: Message) -> str:
+    await _update_log_index()
     top_10_s = ', '.join(_top_n_rank_by_line_type(CHAT_LOG_RE, n=10))
     return format_msg(msg, f'{top_10_s} (since {_log_start_date()})')
 
 
 @command('!bonkrank', secret=True)
 async def cmd_bonkrank(config: Config, msg: Message) -> str:
+    await _update_log_index()
     # TODO: handle display name
     user = msg.optional_user_arg.lower()
     ret = _user_rank_by_line_type(user, BONKER_RE)
@@ -138,12 +365,14 @@ async def cmd_bonkrank(config: Config, msg: Message) -> str:
 
 @command('!top5bonkers', secret=True)
 async def cmd_top_5_bonkers(config: Config, msg: Message) -> str:
+    await _update_log_index()
     top_5_s = ', '.join(_top_n_rank_by_line_type(BONKER_RE, n=5))
     return format_msg(msg, top_5_s)
 
 
 @command('!bonkedrank', secret=True)
 async def cmd_bonkedrank(config: Config, msg: Message) -> str:
+    await _update_log_index()
     # TODO: handle display name
     user = msg.optional_user_arg.lower()
     ret = _user_rank_by_line_type(user, BONKED_RE)
@@ -159,6 +388,7 @@ async def cmd_bonkedrank(config: Config, msg: Message) -> str:
 
 @command('!top5bonked', secret=True)
 async def cmd_top_5_bonked(config: Config, msg: Message) -> str:
+    await _update_log_index()
     top_5_s = ', '.join(_top_n_rank_by_line_type(BONKED_RE, n=5))
     return format_msg(msg, top_5_s)
 
@@ -173,31 +403,38 @@ def lin_regr(x: Sequence[float], y: Sequence[float]) -> tuple[float, float]:
     return a, b
 
 
-@command('!chatplot')
-async def cmd_chatplot(config: Config, msg: Message) -> str:
-    # TODO: handle display name
-    user_list = msg.optional_user_arg.lower().split()
-    user_list = [_alias(user.lstrip('@')) for user in user_list]
-    user_list = list(dict.fromkeys(user_list))
-
-    if len(user_list) > 2:
-        return format_msg(msg, 'sorry, can only compare 2 users')
-
+async def _upload_chart(data: str) -> str:
+    async with get_session().post(
+            'https://quickchart.io/chart/create',
+            json={'chart': data},
+            raise_for_status=True,
+            timeout=aiohttp.ClientTimeout(total=10),
+    ) as resp:
+        contents = await resp.json()
+        return contents['url']
+
+
+# charts only change when a new day of logs is complete
+@async_lru.alru_cache(maxsize=32)
+async def _chatplot(
+        user_list: tuple[str, ...],
+        last_log: str,
+        channel: str,
+) -> str:
+    today = f'{CLOCK.today_str()}.log'
     min_date = datetime.date.fromisoformat(_log_start_date())
     comp_users: dict[str, dict[str, list[int]]]
     comp_users = collections.defaultdict(lambda: {'x': [], 'y': []})
-    for filename in sorted(os.listdir('logs')):
-        if filename == f'{datetime.date.today()}.log':
-            continue
-
-        filename_date = datetime.date.fromisoformat(filename.split('.')[0])
-
-        full_filename = os.path.join('logs', filename)
-        counts = _counts_per_file(full_filename, CHAT_LOG_RE)
-        for user in user_list:
-            if counts[user]:
-                comp_users[user]['x'].append((filename_date - min_date).days)
-                comp_users[user]['y'].append(counts[user])
+    for user in user_list:
+        counts = await asyncio.to_thread(
+            _log_index().daily_chat_counts, user,
+        )
+        for filename in sorted(counts):
+            if filename == today:
+                continue
+            filename_date = datetime.date.fromisoformat(filename.split('.')[0])
+            comp_users[user]['x'].append((filename_date - min_date).days)
+            comp_users[user]['y'].append(counts[filename])
 
     # create the datasets (scatter and trend line) for all users to compare
     PLOT_COLORS = ('#00a3ce', '#fab040')
@@ -205,15 +442,9 @@ async def cmd_chatplot(config: Config, msg: Message) -> str:
     for user, color in zip(user_list, PLOT_COLORS):
         if len(comp_users[user]['x']) < 2:
             if len(user_list) > 1:
-                return format_msg(
-                    msg,
-                    'sorry, all users need at least 2 days of data',
-                )
+                return 'sorry, all users need at least 2 days of data'
             else:
-                return format_msg(
-                    msg,
-                    f'sorry {esc(user)}, need at least 2 days of data',
-                )
+                return f'sorry {esc(user)}, need at least 2 days of data'
 
         point_data = {
             'label': f"{user}'s chats",
@@ -266,7 +497,7 @@ async def cmd_chatplot(config: Config, msg: Message) -> str:
             },
             'title': {
                 'display': True,
-                'text': f'{title_user} chat in twitch.tv/{config.channel}',
+                'text': f'{title_user} chat in twitch.tv/{channel}',
             },
             'legend': {
                 'labels': {'filter': 'FILTER'},
@@ -290,20 +521,33 @@ async def cmd_chatplot(config: Config, msg: Message) -> str:
     data = data.replace('"CALLBACK"', callback)
     data = data.replace('"FILTER"', filter)
 
-    post_data = {'chart': data}
-    request = urllib.request.Request(
-        'https://quickchart.io/chart/create',
-        method='POST',
-        data=json.dumps(post_data).encode(),
-        headers={'Content-Type': 'application/json'},
-    )
-    resp = urllib.request.urlopen(request)
-    contents = json.load(resp)
+    url = await _upload_chart(data)
     user_esc = [esc(user) for user in user_list]
     if len(user_list) > 1:
-        return format_msg(
-            msg,
-            f'comparing {", ".join(user_esc)}: {contents["url"]}',
-        )
+        return f'comparing {", ".join(user_esc)}: {url}'
     else:
-        return format_msg(msg, f'{esc(user_esc[0])}: {contents["url"]}')
+        return f'{esc(user_esc[0])}: {url}'
+
+
+@command('!chatplot')
+@concurrency_limit(1)
+async def cmd_chatplot(config: Config, msg: Message) -> str:
+    # TODO: handle display name
+    user_list = msg.optional_user_arg.lower().split()
+    user_list = [_alias(user.lstrip('@')) for user in user_list]
+    user_list = list(dict.fromkeys(user_list))
+
+    if len(user_list) > 2:
+        return format_msg(msg, 'sorry, can only compare 2 users')
+
+    await _update_log_index()
+    today = f'{CLOCK.today_str()}.log'
+    last_log = max(
+        (f for f in _log_filenames('logs') if f != today),
+        default='',
+    )
+    try:
+        s = await _chatplot(tuple(user_list), last_log, config.channel)
+    except (aiohttp.ClientError, TimeoutError):
+        s = 'sorry, could not create the chart -- try again later'
+    return format_msg(msg, s)
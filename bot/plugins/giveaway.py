@@ -2,39 +2,20 @@ from __future__ import annotations
 
 import random
 
-import aiosqlite
-
 from bot.config import Config
 from bot.data import command
 from bot.data import esc
 from bot.data import format_msg
+from bot.db import connect
 from bot.message import Message
 
 
-async def ensure_giveaway_tables_exist(db: aiosqlite.Connection) -> None:
-    await db.execute(
-        'CREATE TABLE IF NOT EXISTS giveaway ('
-        '    active BIT NOT NULL,'
-        '    PRIMARY KEY (active)'
-        ')',
-    )
-    await db.execute(
-        'CREATE TABLE IF NOT EXISTS giveaway_users ('
-        '    user TEXT NOT NULL,'
-        '    PRIMARY KEY (user)'
-        ')',
-    )
-    await db.commit()
-
-
 @command('!giveawaystart', secret=True)
 async def givewawaystart(config: Config, msg: Message) -> str | None:
     if not msg.is_moderator and msg.name_key != config.channel:
         return None
 
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_giveaway_tables_exist(db)
-
+    async with connect() as db:
         await db.execute('INSERT OR REPLACE INTO giveaway VALUES (1)')
         await db.commit()
 
@@ -43,15 +24,12 @@ async def givewawaystart(config: Config, msg: Message) -> str | None:
 
 @command('!giveaway', secret=True)
 async def giveaway(config: Config, msg: Message) -> str:
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_giveaway_tables_exist(db)
-
+    async with connect() as db:
         async with db.execute('SELECT active FROM giveaway') as cursor:
             row = await cursor.fetchone()
             if row is None or not row[0]:
                 return format_msg(msg, 'no current giveaway active!')
 
-        await ensure_giveaway_tables_exist(db)
         query = 'INSERT OR REPLACE INTO giveaway_users VALUES (?)'
         await db.execute(query, (msg.display_name,))
         await db.commit()
@@ -64,9 +42,7 @@ async def giveawayend(config: Config, msg: Message) -> str | None:
     if not msg.is_moderator and msg.name_key != config.channel:
         return None
 
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_giveaway_tables_exist(db)
-
+    async with connect() as db:
         async with db.execute('SELECT active FROM giveaway') as cursor:
             row = await cursor.fetchone()
             if row is None or not row[0]:
@@ -80,8 +56,8 @@ async def giveawayend(config: Config, msg: Message) -> str | None:
             await db.execute('INSERT OR REPLACE INTO giveaway VALUES (0)')
             await db.commit()
 
-        await db.execute('DROP TABLE giveaway_users')
-        await db.execute('DROP TABLE giveaway')
+        await db.execute('DELETE FROM giveaway_users')
+        await db.execute('DELETE FROM giveaway')
         await db.commit()
 
     if not users:
@@ -2,13 +2,13 @@ from __future__ import annotations
 
 from typing import TypedDict
 
-import aiohttp
 import async_lru
 
 from bot.config import Config
 from bot.data import command
 from bot.data import esc
 from bot.data import format_msg
+from bot.http_session import get_session
 from bot.message import Message
 
 
@@ -29,21 +29,19 @@ class PronounData(TypedDict):
 async def _get_user_data(username: str) -> UserData | None:
     url = f'https://api.pronouns.alejo.io/v1/users/{username}'
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                return None
+    async with get_session().get(url) as resp:
+        if resp.status != 200:
+            return None
 
-            return (await resp.json())
+        return (await resp.json())
 
 
 @async_lru.alru_cache(maxsize=1)
 async def pronouns() -> dict[str, PronounData]:
     url = 'https://api.pronouns.alejo.io/v1/pronouns/'
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            return (await resp.json())
+    async with get_session().get(url) as resp:
+        return (await resp.json())
 
 
 async def _get_user_pronouns(username: str) -> tuple[str, str] | None:
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-import datetime
 import random
 
+from bot.clock import CLOCK
 from bot.config import Config
 from bot.data import command
 from bot.data import esc
@@ -13,6 +13,6 @@ from bot.message import Message
 @command('!still')
 async def cmd_still(config: Config, msg: Message) -> str:
     _, _, rest = msg.msg.partition(' ')
-    year = datetime.date.today().year
+    year = CLOCK.today().year
     lol = random.choice(['LOL', 'LOLW', 'LMAO', 'NUUU'])
     return format_msg(msg, f'{esc(rest)}, in {year} - {lol}!')
@@ -1,24 +1,24 @@
 from __future__ import annotations
 
-import collections
+import asyncio
 import datetime
 import os.path
-from collections import Counter
 
 import aiosqlite
 
 from bot.config import Config
+from bot.data import background_handler
 from bot.data import bits_handler
 from bot.data import command
 from bot.data import esc
 from bot.data import format_msg
-from bot.data import periodic_handler
+from bot.db import connect
 from bot.message import Message
-from bot.ranking import tied_rank
-from bot.util import check_call
+from bot.ranking import Leaderboard
+from bot.util import atomic_symlink
 from bot.util import seconds_to_readable
 
-# periodic: per-second check to restore state
+# background: restore state at startup and when the timer expires
 # data:
 # - (datetime, user, bits)
 # - (end datetime)
@@ -29,37 +29,8 @@ from bot.util import seconds_to_readable
 # - !vimdisable
 # - !vimenable
 
-_VIM_BITS_TABLE = '''\
-CREATE TABLE IF NOT EXISTS vim_bits (
-    user TEXT NOT NULL,
-    bits INT NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-'''
-_VIM_BITS_DISABLED_TABLE = '''\
-CREATE TABLE IF NOT EXISTS vim_bits_disabled (
-    user TEXT NOT NULL,
-    bits INT NOT NULL,
-    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-)
-'''
-_VIM_TIME_LEFT_TABLE = '''\
-CREATE TABLE IF NOT EXISTS vim_time_left (
-    timestamp TIMESTAMP NOT NULL
-)
-'''
-_VIM_ENABLED_TABLE = '''\
-CREATE TABLE IF NOT EXISTS vim_enabled (
-    enabled INT NOT NULL
-)
-'''
-
 
-async def _ln_sf(dest: str, link: str) -> None:
-    await check_call('ln', '-sf', dest, link)
-
-
-async def _set_symlink(*, should_be_vim: bool) -> bool:
+def _set_symlink(*, should_be_vim: bool) -> bool:
     babi_path = os.path.expanduser('~/opt/venv/bin/babi')
     vim_path = os.path.expanduser('/usr/bin/vim')
     babi_bin = os.path.expanduser('~/bin/babi')
@@ -67,23 +38,15 @@ async def _set_symlink(*, should_be_vim: bool) -> bool:
     path = os.path.realpath(babi_bin)
 
     if should_be_vim and path != vim_path:
-        await _ln_sf(dest=vim_path, link=babi_bin)
+        atomic_symlink(vim_path, babi_bin)
         return False
     elif not should_be_vim and path != babi_path:
-        await _ln_sf(dest=babi_path, link=babi_bin)
+        atomic_symlink(babi_path, babi_bin)
         return True
     else:
         return False
 
 
-async def ensure_vim_tables_exist(db: aiosqlite.Connection) -> None:
-    await db.execute(_VIM_BITS_TABLE)
-    await db.execute(_VIM_BITS_DISABLED_TABLE)
-    await db.execute(_VIM_TIME_LEFT_TABLE)
-    await db.execute(_VIM_ENABLED_TABLE)
-    await db.commit()
-
-
 async def get_enabled(db: aiosqlite.Connection) -> bool:
     query = 'SELECT enabled FROM vim_enabled ORDER BY ROWID DESC LIMIT 1'
     async with db.execute(query) as cursor:
@@ -95,42 +58,125 @@ async def get_enabled(db: aiosqlite.Connection) -> bool:
             return bool(enabled)
 
 
-async def get_time_left(db: aiosqlite.Connection) -> int:
-    if not await get_enabled(db):
-        return 0
-
+async def get_end(db: aiosqlite.Connection) -> datetime.datetime | None:
     query = 'SELECT timestamp FROM vim_time_left ORDER BY ROWID DESC LIMIT 1'
     async with db.execute(query) as cursor:
         ret = await cursor.fetchone()
         if ret is None:
+            return None
+        else:
+            return datetime.datetime.fromisoformat(ret[0])
+
+
+class VimTimer:
+    """the timer's state, kept in memory and mirrored to the db
+
+    rather than polling, expiry is scheduled with `loop.call_at` and
+    re-armed whenever the state changes.
+    """
+
+    def __init__(
+            self,
+            *,
+            enabled: bool,
+            end: datetime.datetime | None,
+    ) -> None:
+        self.enabled = enabled
+        self.end = end
+        self.changed = asyncio.Event()
+        self.changed.set()  # the symlink may need fixing up at startup
+        self._handle: asyncio.TimerHandle | None = None
+        self._arm()
+
+    def _arm(self) -> None:
+        if self._handle is not None:
+            self._handle.cancel()
+
+        if self.enabled and self.end is not None:
+            delay = (self.end - datetime.datetime.now()).total_seconds()
+        else:
+            delay = 0
+        loop = asyncio.get_running_loop()
+        self._handle = loop.call_at(
+            loop.time() + max(delay, 0), self.changed.set,
+        )
+
+    def _seconds_to_end(self) -> int:
+        if self.end is None:
             return 0
         else:
-            dt = datetime.datetime.fromisoformat(ret[0])
-            if dt < datetime.datetime.now():
-                return 0
-            else:
-                return (dt - datetime.datetime.now()).seconds
+            delta = self.end - datetime.datetime.now()
+            return max(int(delta.total_seconds()), 0)
+
+    def time_left(self) -> int:
+        if not self.enabled:
+            return 0
+        else:
+            return self._seconds_to_end()
+
+    def extended(self, seconds: int) -> tuple[int, datetime.datetime]:
+        """the time left and the end with `seconds` more, as if enabled
+
+        nothing changes until `set_end` so the db can be written first.  time
+        left from before vim was disabled still counts.
+        """
+        time_left = self._seconds_to_end() + seconds
+        delta = datetime.timedelta(seconds=time_left)
+        return time_left, datetime.datetime.now() + delta
+
+    def set_end(self, end: datetime.datetime) -> None:
+        self.end = end
+        self._arm()
+
+    def set_enabled(self, enabled: bool) -> None:
+        self.enabled = enabled
+        self._arm()
+
+    async def wait_changed(self) -> None:
+        await self.changed.wait()
+        self.changed.clear()
+        # `end` is wall clock time but the wake up is on the loop's clock, so
+        # if they drifted apart this may be early: wait for the rest
+        if self.time_left() > 0:
+            self._arm()
+
+
+# loaded on first use -- the background handler does so at startup
+_VIM_TIMER: VimTimer | None = None
+
+
+async def _vim_timer(db: aiosqlite.Connection) -> VimTimer:
+    global _VIM_TIMER
+    if _VIM_TIMER is None:
+        _VIM_TIMER = VimTimer(
+            enabled=await get_enabled(db),
+            end=await get_end(db),
+        )
+    return _VIM_TIMER
 
 
 def _bits_to_seconds(bits: int) -> int:
     return 60 * (100 + bits - 51) // 100
 
 
-async def add_time(db: aiosqlite.Connection, seconds: int) -> int:
-    time_left = await get_time_left(db)
-    time_left += seconds
-    await db.execute(
-        'INSERT INTO vim_time_left VALUES (?)',
-        (datetime.datetime.now() + datetime.timedelta(seconds=time_left),),
-    )
-    return time_left
+async def add_time(
+        db: aiosqlite.Connection,
+        seconds: int,
+) -> tuple[int, datetime.datetime]:
+    """store the end with `seconds` more, `set_end` it once committed"""
+    time_left, end = (await _vim_timer(db)).extended(seconds)
+    await db.execute('INSERT INTO vim_time_left VALUES (?)', (end,))
+    return time_left, end
 
 
 async def add_bits(db: aiosqlite.Connection, user: str, bits: int) -> int:
     vim_bits_query = 'INSERT INTO vim_bits (user, bits) VALUES (?, ?)'
     await db.execute(vim_bits_query, (user, bits))
-    time_left = await add_time(db, _bits_to_seconds(bits))
+    time_left, end = await add_time(db, _bits_to_seconds(bits))
     await db.commit()
+    (await _vim_timer(db)).set_end(end)
+    if _BITS_LEADERBOARD is not None:
+        _BITS_LEADERBOARD.increment(user.lower(), bits)
     return time_left
 
 
@@ -150,9 +196,8 @@ async def add_bits_off(db: aiosqlite.Connection, user: str, bits: int) -> int:
 
 @bits_handler(51)
 async def vim_bits_handler(config: Config, msg: Message) -> str:
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
-        enabled = await get_enabled(db)
+    async with connect() as db:
+        enabled = (await _vim_timer(db)).enabled
 
         bits = int(msg.info['bits'])
         if enabled:
@@ -162,7 +207,7 @@ async def vim_bits_handler(config: Config, msg: Message) -> str:
             time_left = await add_bits_off(db, msg.name_key, bits)
 
     if enabled:
-        await _set_symlink(should_be_vim=True)
+        _set_symlink(should_be_vim=True)
 
         return format_msg(
             msg,
@@ -176,44 +221,41 @@ async def vim_bits_handler(config: Config, msg: Message) -> str:
         )
 
 
-async def _get_user_vim_bits(
-    db: aiosqlite.Connection,
-) -> Counter[str]:
-    vim_bits_query = 'SELECT user, SUM(bits) FROM vim_bits GROUP BY user'
-    async with db.execute(vim_bits_query) as cursor:
-        rows = await cursor.fetchall()
-        bits_counts = collections.Counter(dict(rows))
-        return bits_counts
+# loaded on first use and then kept up to date as bits come in.  keyed by
+# lowercased user, older rows were not always stored that way
+_BITS_LEADERBOARD: Leaderboard | None = None
+
+
+async def _bits_leaderboard(db: aiosqlite.Connection) -> Leaderboard:
+    global _BITS_LEADERBOARD
+    if _BITS_LEADERBOARD is None:
+        vim_bits_query = (
+            'SELECT LOWER(user), SUM(bits) FROM vim_bits GROUP BY LOWER(user)'
+        )
+        async with db.execute(vim_bits_query) as cursor:
+            rows = await cursor.fetchall()
+        _BITS_LEADERBOARD = Leaderboard.from_counts(dict(rows))
+    return _BITS_LEADERBOARD
 
 
 async def _user_rank_by_bits(
         username: str, db: aiosqlite.Connection,
 ) -> tuple[int, int] | None:
-    total = await _get_user_vim_bits(db)
-    target_username = username.lower()
-    for rank, (count, users) in tied_rank(total.most_common()):
-        for username, _ in users:
-            if target_username == username.lower():
-                return rank, count
-    else:
-        return None
+    return (await _bits_leaderboard(db)).rank(username.lower())
 
 
 async def _top_n_rank_by_bits(
     db: aiosqlite.Connection, n: int = 5,
 ) -> list[str]:
-    total = await _get_user_vim_bits(db)
-    user_list = []
-    for rank, (count, users) in tied_rank(total.most_common(n)):
-        usernames = ', '.join(username for username, _ in users)
-        user_list.append(f'{rank}. {usernames} ({count})')
-    return user_list
+    return [
+        f'{rank}. {", ".join(users)} ({count})'
+        for rank, count, users in (await _bits_leaderboard(db)).top(n)
+    ]
 
 
 @command('!top5vimbits', '!topvimbits', secret=True)
 async def cmd_topvimbits(config: Config, msg: Message) -> str:
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
+    async with connect() as db:
         top_10_s = ', '.join(await _top_n_rank_by_bits(db, n=5))
         return format_msg(msg, f'{top_10_s}')
 
@@ -222,7 +264,7 @@ async def cmd_topvimbits(config: Config, msg: Message) -> str:
 async def cmd_vimbitsrank(config: Config, msg: Message) -> str:
     # TODO: handle display name properly
     user = msg.optional_user_arg.lower()
-    async with aiosqlite.connect('db.db') as db:
+    async with connect() as db:
         ret = await _user_rank_by_bits(user, db)
         if ret is None:
             return format_msg(msg, f'user not found {esc(user)}')
@@ -236,19 +278,20 @@ async def cmd_vimbitsrank(config: Config, msg: Message) -> str:
 
 @command('!vimtimeleft', secret=True)
 async def cmd_vimtimeleft(config: Config, msg: Message) -> str:
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
-        if not await get_enabled(db):
-            return format_msg(msg, 'vim is currently disabled')
-
-        time_left = await get_time_left(db)
-        if time_left == 0:
-            return format_msg(msg, 'not currently using vim')
-        else:
-            return format_msg(
-                msg,
-                f'vim time remaining: {seconds_to_readable(time_left)}',
-            )
+    async with connect() as db:
+        timer = await _vim_timer(db)
+
+    if not timer.enabled:
+        return format_msg(msg, 'vim is currently disabled')
+
+    time_left = timer.time_left()
+    if time_left == 0:
+        return format_msg(msg, 'not currently using vim')
+    else:
+        return format_msg(
+            msg,
+            f'vim time remaining: {seconds_to_readable(time_left)}',
+        )
 
 
 @command('!disablevim', secret=True)
@@ -256,11 +299,11 @@ async def cmd_disablevim(config: Config, msg: Message) -> str:
     if not msg.is_moderator and msg.name_key != config.channel:
         return format_msg(msg, 'https://youtu.be/RfiQYRn7fBg')
 
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
-
+    async with connect() as db:
+        timer = await _vim_timer(db)
         await db.execute('INSERT INTO vim_enabled VALUES (0)')
         await db.commit()
+        timer.set_enabled(False)
 
     return format_msg(msg, 'vim has been disabled')
 
@@ -270,20 +313,28 @@ async def cmd_enablevim(config: Config, msg: Message) -> str:
     if not msg.is_moderator and msg.name_key != config.channel:
         return format_msg(msg, 'https://youtu.be/RfiQYRn7fBg')
 
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
-
+    async with connect() as db:
+        timer = await _vim_timer(db)
         await db.execute('INSERT INTO vim_enabled VALUES (1)')
+        query = 'SELECT user, bits FROM vim_bits_disabled'
+        async with db.execute(query) as cursor:
+            moved = await cursor.fetchall()
         move_query = 'INSERT INTO vim_bits SELECT * FROM vim_bits_disabled'
         await db.execute(move_query)
-        time_left = await add_time(db, await disabled_seconds(db))
+        time_left, end = await add_time(db, await disabled_seconds(db))
         await db.execute('DELETE FROM vim_bits_disabled')
         await db.commit()
+        timer.set_end(end)
+        timer.set_enabled(True)
+
+    if _BITS_LEADERBOARD is not None:
+        for user, bits in moved:
+            _BITS_LEADERBOARD.increment(user.lower(), bits)
 
     if time_left == 0:
         return format_msg(msg, 'vim has been enabled')
     else:
-        await _set_symlink(should_be_vim=True)
+        _set_symlink(should_be_vim=True)
         return format_msg(
             msg,
             f'vim has been enabled: '
@@ -296,32 +347,37 @@ async def cmd_enablevim(config: Config, msg: Message) -> str:
     '!babi', '!nano', '!vim', '!emacs', '!vscode', '!wheredobabiscomefrom',
 )
 async def cmd_editor(config: Config, msg: Message) -> str:
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
-        if await get_time_left(db):
-            return format_msg(
-                msg,
-                'I am currently being forced to use vim by viewers. '
-                'awcBabi I normally use my text editor I made, called babi! '
-                'https://github.com/asottile/babi more info in this video: '
-                'https://www.youtube.com/watch?v=WyR1hAGmR3g',
-            )
-        else:
-            return format_msg(
-                msg,
-                'awcBabi this is my text editor I made, called babi! '
-                'https://github.com/asottile/babi more info in this video: '
-                'https://www.youtube.com/watch?v=WyR1hAGmR3g',
-            )
+    async with connect() as db:
+        timer = await _vim_timer(db)
+
+    if timer.time_left():
+        return format_msg(
+            msg,
+            'I am currently being forced to use vim by viewers. '
+            'awcBabi I normally use my text editor I made, called babi! '
+            'https://github.com/asottile/babi more info in this video: '
+            'https://www.youtube.com/watch?v=WyR1hAGmR3g',
+        )
+    else:
+        return format_msg(
+            msg,
+            'awcBabi this is my text editor I made, called babi! '
+            'https://github.com/asottile/babi more info in this video: '
+            'https://www.youtube.com/watch?v=WyR1hAGmR3g',
+        )
 
 
-@periodic_handler(seconds=5)
+@background_handler
 async def vim_normalize_state(config: Config, msg: Message) -> str | None:
-    async with aiosqlite.connect('db.db') as db:
-        await ensure_vim_tables_exist(db)
-        time_left = await get_time_left(db)
-
-    cleared_vim = await _set_symlink(should_be_vim=time_left > 0)
+    async with connect() as db:
+        timer = await _vim_timer(db)
+    await timer.wait_changed()
+
+    try:
+        cleared_vim = _set_symlink(should_be_vim=timer.time_left() > 0)
+    except BaseException:
+        timer.changed.set()  # try again (after the failure backoff)
+        raise
     if cleared_vim:
         return format_msg(msg, 'vim no more! you are free!')
     else:
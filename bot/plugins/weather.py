@@ -2,12 +2,12 @@ from __future__ import annotations
 
 import re
 
-import aiohttp
-
 from bot.config import Config
 from bot.data import command
+from bot.data import concurrency_limit
 from bot.data import esc
 from bot.data import format_msg
+from bot.http_session import get_session
 from bot.message import Message
 
 
@@ -19,6 +19,7 @@ def c2f(celsius: float) -> float:
 
 
 @command('!weather', secret=True)
+@concurrency_limit(2)
 async def cmd_weather(config: Config, msg: Message) -> str:
     _, _, rest = msg.msg.partition(' ')
     if rest:
@@ -38,21 +39,21 @@ async def cmd_weather(config: Config, msg: Message) -> str:
         'zip': zip_code,
         'appid': config.openweathermap_api_key,
     }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(geocoding_url, params=geocoding_params) as resp:
-            geocoding_resp = await resp.json()
+    session = get_session()
+    async with session.get(geocoding_url, params=geocoding_params) as resp:
+        geocoding_resp = await resp.json()
 
-        lat, lon = geocoding_resp.get('lat'), geocoding_resp.get('lon')
-        if lat is None or lon is None:
-            return format_msg(msg, 'Did not find this place...')
+    lat, lon = geocoding_resp.get('lat'), geocoding_resp.get('lon')
+    if lat is None or lon is None:
+        return format_msg(msg, 'Did not find this place...')
 
-        weather_params = {
-            'lon': lon,
-            'lat': lat,
-            'appid': config.openweathermap_api_key,
-        }
-        async with session.get(weather_url, params=weather_params) as resp:
-            json_resp = await resp.json()
+    weather_params = {
+        'lon': lon,
+        'lat': lat,
+        'appid': config.openweathermap_api_key,
+    }
+    async with session.get(weather_url, params=weather_params) as resp:
+        json_resp = await resp.json()
 
     # need to convert from Kelvin
     temp_c = json_resp['main']['temp'] - 273.15
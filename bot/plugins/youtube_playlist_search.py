@@ -2,7 +2,6 @@ from __future__ import annotations
 
 from typing import NamedTuple
 
-import aiohttp
 import aiosqlite
 import async_lru
 
@@ -10,6 +9,8 @@ from bot.config import Config
 from bot.data import command
 from bot.data import esc
 from bot.data import format_msg
+from bot.db import connect
+from bot.http_session import get_session
 from bot.message import Message
 
 
@@ -33,9 +34,8 @@ class YouTubeVideo(NamedTuple):
 
 @async_lru.alru_cache(maxsize=None)
 async def _info() -> tuple[tuple[Playlist, ...], tuple[YouTubeVideo, ...]]:
-    async with aiohttp.ClientSession() as session:
-        async with session.get('https://anthonywritescode.github.io/explains/playlists.json') as resp:  # noqa: E501
-            resp = await resp.json()
+    async with get_session().get('https://anthonywritescode.github.io/explains/playlists.json') as resp:  # noqa: E501
+        resp = await resp.json()
 
     playlists = tuple(
         Playlist(playlist['playlist_name'], playlist['playlist_id'])
@@ -53,7 +53,9 @@ async def _info() -> tuple[tuple[Playlist, ...], tuple[YouTubeVideo, ...]]:
 
 @async_lru.alru_cache(maxsize=None)
 async def _populate_playlists() -> None:
-    async with aiosqlite.connect('db.db') as db:
+    _, videos = await _info()
+
+    async with connect() as db:
         await db.execute('DROP TABLE IF EXISTS youtube_videos')
         await db.execute(
             'CREATE VIRTUAL TABLE youtube_videos using FTS5 '
@@ -61,8 +63,6 @@ async def _populate_playlists() -> None:
         )
         await db.commit()
 
-        _, videos = await _info()
-
         query = 'INSERT INTO youtube_videos VALUES (?, ?, ?)'
         await db.executemany(query, videos)
 
@@ -101,7 +101,7 @@ async def _msg(playlist_name: str, search_terms: str) -> str:
     if not search_terms.strip():
         return f'see playlist: {playlist.url}'
 
-    async with aiosqlite.connect('db.db') as db:
+    async with connect() as db:
         try:
             videos = await _search_playlist(db, playlist_name, search_terms)
         except aiosqlite.OperationalError:
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+import time
+
+PROC = '/proc'
+# processes come and go rarely compared to how often we signal them, a stale
+# pid is caught when signalling, a new process waits at most this long.
+# finding nothing is not cached: the process may be about to start
+CACHE_SECONDS = 10
+
+_PIDS: dict[str, tuple[float, tuple[int, ...]]] = {}
+
+
+def _comm(pid: int) -> str | None:
+    try:
+        with open(os.path.join(PROC, str(pid), 'comm')) as f:
+            return f.read().rstrip('\n')
+    except OSError:  # it exited (or it isn't ours to look at)
+        return None
+
+
+def _scan(name: str) -> tuple[int, ...]:
+    try:
+        entries = os.listdir(PROC)
+    except OSError:
+        return ()
+    else:
+        return tuple(
+            int(entry)
+            for entry in entries
+            if entry.isdigit() and _comm(int(entry)) == name
+        )
+
+
+def pids(name: str) -> tuple[int, ...]:
+    """pids of processes named `name` (as in /proc/PID/comm)
+
+    this needs linux's /proc: elsewhere nothing is ever found
+    """
+    now = time.monotonic()
+    cached = _PIDS.get(name)
+    if cached is None or now - cached[0] > CACHE_SECONDS:
+        found = _scan(name)
+        if found:
+            _PIDS[name] = (now, found)
+        else:
+            _PIDS.pop(name, None)
+        return found
+    else:
+        return cached[1]
+
+
+def invalidate(name: str) -> None:
+    _PIDS.pop(name, None)
+
+
+def signal_all(name: str, sig: int) -> int:
+    """`pkill -SIG name` without the fork, returns how many were signalled
+
+    names are matched exactly (comm is truncated to 15 characters)
+    """
+    signalled = 0
+    for pid in pids(name):
+        # the pid may have exited (or even been reused) since it was cached
+        if _comm(pid) != name:
+            invalidate(name)
+            continue
+
+        try:
+            os.kill(pid, sig)
+        except ProcessLookupError:
+            invalidate(name)
+        else:
+            signalled += 1
+    return signalled
@@ -1,13 +1,74 @@
 from __future__ import annotations
 
+import bisect
 import itertools
 from collections.abc import Iterator
-from collections.abc import Sequence
+from collections.abc import Mapping
 
 
-def tied_rank(
-        counts: Sequence[tuple[str, int]],
-) -> Iterator[tuple[int, tuple[int, Iterator[tuple[str, int]]]]]:
-    # "counts" should be sorted, usually produced by Counter.most_common()
-    grouped = itertools.groupby(counts, key=lambda pair: pair[1])
-    yield from enumerate(grouped, start=1)
+class Leaderboard:
+    """per-user counts with tied (dense) ranks
+
+    users are bucketed by count and the distinct counts are kept sorted so
+    incrementing and looking up a rank is a bisect over the distinct counts
+    rather than a sort of every user.
+    """
+
+    def __init__(self) -> None:
+        self._counts: dict[str, int] = {}
+        # count => users with that count (a dict to keep insertion order)
+        self._buckets: dict[int, dict[str, None]] = {}
+        self._scores: list[int] = []  # the distinct counts, ascending
+
+    @classmethod
+    def from_counts(cls, counts: Mapping[str, int]) -> Leaderboard:
+        ret = cls()
+        for user, n in counts.items():
+            ret.increment(user, n)
+        return ret
+
+    @property
+    def counts(self) -> Mapping[str, int]:
+        return self._counts
+
+    def _add(self, user: str, count: int) -> None:
+        bucket = self._buckets.get(count)
+        if bucket is None:
+            bucket = self._buckets[count] = {}
+            bisect.insort(self._scores, count)
+        bucket[user] = None
+
+    def _remove(self, user: str, count: int) -> None:
+        bucket = self._buckets[count]
+        del bucket[user]
+        if not bucket:
+            del self._buckets[count]
+            del self._scores[bisect.bisect_left(self._scores, count)]
+
+    def increment(self, user: str, n: int = 1) -> None:
+        count = self._counts.pop(user, 0)
+        if count:
+            self._remove(user, count)
+
+        count += n
+        if count > 0:
+            self._counts[user] = count
+            self._add(user, count)
+
+    def rank(self, user: str) -> tuple[int, int] | None:
+        """(rank, count) for `user` -- tied users share a rank"""
+        count = self._counts.get(user)
+        if count is None:
+            return None
+        else:
+            rank = len(self._scores) - bisect.bisect_left(self._scores, count)
+            return rank, count
+
+    def top(self, n: int) -> Iterator[tuple[int, int, list[str]]]:
+        """(rank, count, users) for the top `n` users"""
+        for rank, count in enumerate(reversed(self._scores), start=1):
+            if n <= 0:
+                return
+            users = list(itertools.islice(self._buckets[count], n))
+            n -= len(users)
+            yield rank, count, users
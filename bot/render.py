@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+import traceback
+from collections.abc import Awaitable
+from collections.abc import Callable
+from typing import NamedTuple
+
+# how long a line may wait on its images before it is printed as text
+DEADLINE = 2.
+
+
+class _Line(NamedTuple):
+    fallback: str
+    fut: asyncio.Future[str] | None
+    deadline: float
+
+
+class RenderQueue:
+    """print lines in the order they arrived, even if some are slow
+
+    a line with images is rendered in the background and printed once it's
+    ready.  the lines after it wait their turn, but never past their own
+    deadline (counted from when they arrived): then the text is printed.
+    """
+
+    def __init__(
+            self,
+            *,
+            deadline: float = DEADLINE,
+            print_func: Callable[[str], None] = print,
+    ) -> None:
+        self.deadline = deadline
+        self._print = print_func
+        self._lines: collections.deque[_Line] = collections.deque()
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+        self.rendered = 0
+        self.fallbacks = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._lines)
+
+    def put(self, line: str) -> None:
+        if not self._lines:  # nothing to wait behind
+            self._print(line)
+        else:
+            self._lines.append(_Line(line, None, 0))
+
+    def put_render(self, coro: Awaitable[str], *, fallback: str) -> None:
+        loop = asyncio.get_running_loop()
+        fut = asyncio.ensure_future(coro)
+        self._lines.append(_Line(fallback, fut, loop.time() + self.deadline))
+        self._wakeup.set()
+
+    async def _render(self, line: _Line) -> str:
+        if line.fut is None:
+            return line.fallback
+
+        timeout = line.deadline - asyncio.get_running_loop().time()
+        # not `wait_for`: it drops a cancellation that arrives as the render
+        # finishes, and then `stop()` waits forever
+        done, _ = await asyncio.wait((line.fut,), timeout=max(timeout, 0))
+        if not done:
+            line.fut.cancel()
+            self.fallbacks += 1
+            return line.fallback
+
+        try:
+            ret = line.fut.result()
+        except Exception:
+            traceback.print_exc()
+            self.fallbacks += 1
+            return line.fallback
+        else:
+            self.rendered += 1
+            return ret
+
+    async def _run(self) -> None:
+        while True:
+            if not self._lines:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            s = await self._render(self._lines[0])
+            self._lines.popleft()
+            self._print(s)
+
+    def start(self) -> None:
+        assert self._task is None, 'already started'
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        # don't lose what's left, print it as text
+        while self._lines:
+            line = self._lines.popleft()
+            if line.fut is not None:
+                line.fut.cancel()
+            self._print(line.fallback)
+
+    def report(self) -> str:
+        return (
+            f'render: rendered={self.rendered} fallbacks={self.fallbacks} '
+            f'queued={self.queued}'
+        )
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Generator
+
+REPLAY_HOST = '127.0.0.1'
+DONE_PING = b'PING :replay-done\r\n'
+DONE_PONG = b'PONG :replay-done\r\n'
+
+
+def load_transcript(filename: str) -> list[bytes]:
+    """load raw irc lines -- the `--verbose` output also works"""
+    lines = []
+    with open(filename, 'rb') as f:
+        for line in f:
+            if line.startswith(b'< '):
+                continue
+            line = line.removeprefix(b'> ').rstrip(b'\r\n')
+            if line:
+                lines.append(line + b'\r\n')
+    return lines
+
+
+@contextlib.contextmanager
+def sandbox() -> Generator[str]:
+    """run in an empty directory (and home directory)
+
+    a replay runs the real handlers, which write logs, the databases, the
+    image cache and things under ~ -- none of that should touch the real
+    ones.
+    """
+    orig_cwd = os.getcwd()
+    orig_home = os.environ.get('HOME')
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        os.environ['HOME'] = tmpdir
+        try:
+            yield tmpdir
+        finally:
+            os.chdir(orig_cwd)
+            if orig_home is None:
+                del os.environ['HOME']
+            else:
+                os.environ['HOME'] = orig_home
+
+
+class ReplayServer:
+    """a fake twitch irc server which plays back a transcript
+
+    once every line is sent the server sends a final PING -- lines are
+    processed in order so the bot's PONG means everything was dispatched
+    """
+
+    def __init__(self, lines: list[bytes], *, rate: float | None) -> None:
+        self.lines = lines
+        self.rate = rate
+        self.done: asyncio.Future[float]
+        self.done = asyncio.get_running_loop().create_future()
+        self._server: asyncio.Server | None = None
+
+    @property
+    def port(self) -> int:
+        assert self._server is not None
+        port: int = self._server.sockets[0].getsockname()[1]
+        return port
+
+    async def _handle(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter,
+    ) -> None:
+        if self.done.done():  # the bot reconnected, we have nothing left
+            writer.close()
+            return
+
+        start = time.monotonic()
+        for i, line in enumerate(self.lines, start=1):
+            writer.write(line)
+            if self.rate is not None:
+                await writer.drain()
+                await asyncio.sleep(start + i / self.rate - time.monotonic())
+            elif i % 100 == 0:
+                await writer.drain()
+        writer.write(DONE_PING)
+        await writer.drain()
+
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            elif line == DONE_PONG:
+                self.done.set_result(time.monotonic() - start)
+                return
+
+    async def __aenter__(self) -> ReplayServer:
+        self._server = await asyncio.start_server(self._handle, REPLAY_HOST, 0)
+        return self
+
+    async def __aexit__(self, *args: object) -> None:
+        assert self._server is not None
+        self._server.close()
+
+
+def _percentiles(values: list[float]) -> str:
+    if len(values) < 2:
+        return 'n/a'
+    # inclusive: the default extrapolates, a p99 could be past the max
+    q = statistics.quantiles(values, n=100, method='inclusive')
+    return (
+        f'p50={q[49] * 1000:.2f}ms '
+        f'p90={q[89] * 1000:.2f}ms '
+        f'p99={q[98] * 1000:.2f}ms '
+        f'max={max(values) * 1000:.2f}ms'
+    )
+
+
+class ReplayStats:
+    def __init__(self) -> None:
+        self.handler_latencies: list[float] = []
+        self.loop_lag: list[float] = []
+
+    def timed(
+            self,
+            func: Callable[[], Awaitable[None]],
+    ) -> Callable[[], Awaitable[None]]:
+        """time a handler from the moment its line was received"""
+        start = time.monotonic()
+
+        async def timed() -> None:
+            try:
+                await func()
+            finally:
+                self.handler_latencies.append(time.monotonic() - start)
+        return timed
+
+    async def monitor_loop_lag(self, interval: float = .01) -> None:
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            self.loop_lag.append(time.monotonic() - start - interval)
+
+    def report(self, n_lines: int, elapsed: float, executor: str) -> None:
+        print(
+            f'lines: {n_lines} in {elapsed:.2f}s '
+            f'({n_lines / elapsed:.0f} lines/s)\n'
+            f'latency: {len(self.handler_latencies)} '
+            f'{_percentiles(self.handler_latencies)}\n'
+            f'{executor}\n'
+            f'loop lag: {_percentiles(self.loop_lag)}',
+            file=sys.stderr,
+        )
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import random
+from collections.abc import Awaitable
+from collections.abc import Callable
+
+from bot.data import Callback
+
+
+class Job:
+    def __init__(self, seconds: float, func: Callback, *, jitter: float):
+        self.seconds = seconds
+        self.func = func
+        self.jitter = jitter
+        self.task: asyncio.Task[None] | None = None
+        self.runs = 0
+        self.skipped = 0
+        self.runtime = 0.
+        self.max_runtime = 0.
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None and not self.task.done()
+
+    def report(self) -> str:
+        avg = self.runtime / self.runs if self.runs else 0
+        return (
+            f'{self.func.__qualname__}: every {self.seconds}s '
+            f'runs={self.runs} skipped={self.skipped} '
+            f'avg={avg * 1000:.2f}ms max={self.max_runtime * 1000:.2f}ms'
+        )
+
+
+class Scheduler:
+    """runs periodic jobs from a single heap of deadlines
+
+    jobs are fixed-rate: each run is scheduled from the previous deadline
+    rather than from when the previous run finished, so the schedule does
+    not drift.  jitter delays a single run without moving the schedule.  a
+    run is skipped if the previous one is still going.
+
+    nothing uses `periodic_handler` right now (the vim timer, its only user,
+    is woken by its own timer instead) -- this is here for the next plugin
+    that needs to poll.
+    """
+
+    def __init__(self, run: Callable[[Callback], Awaitable[None]]) -> None:
+        self._run_func = run
+        self.jobs: list[Job] = []
+        self._task: asyncio.Task[None] | None = None
+
+    def add(self, seconds: float, func: Callback, *, jitter: float = 0) -> Job:
+        assert seconds > 0 and 0 <= jitter < seconds, (seconds, jitter)
+        job = Job(seconds, func, jitter=jitter)
+        self.jobs.append(job)
+        return job
+
+    async def _run_job(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        try:
+            await self._run_func(job.func)
+        finally:
+            runtime = loop.time() - start
+            job.runs += 1
+            job.runtime += runtime
+            job.max_runtime = max(job.max_runtime, runtime)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+
+        # (fire at, tiebreak, deadline)
+        heap = [
+            (now + job.seconds + random.uniform(0, job.jitter), i, now)
+            for i, job in enumerate(self.jobs)
+        ]
+        heapq.heapify(heap)
+        while heap:
+            fire_at, i, deadline = heap[0]
+            await asyncio.sleep(fire_at - loop.time())
+
+            job = self.jobs[i]
+            deadline += job.seconds
+            # if the loop was blocked past whole periods, don't run a burst
+            missed, _ = divmod(loop.time() - deadline, job.seconds)
+            if missed > 0:
+                job.skipped += int(missed)
+                deadline += missed * job.seconds
+
+            if job.running:
+                job.skipped += 1
+            else:
+                job.task = loop.create_task(self._run_job(job))
+
+            next_fire = deadline + job.seconds + random.uniform(0, job.jitter)
+            heapq.heapreplace(heap, (next_fire, i, deadline))
+
+    def start(self) -> None:
+        assert self._task is None, 'already started'
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        tasks = [job.task for job in self.jobs if job.task is not None]
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def report(self) -> str:
+        return '\n'.join(job.report() for job in self.jobs)
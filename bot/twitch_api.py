@@ -1,29 +1,295 @@
 from __future__ import annotations
 
+import asyncio
+import collections
+import functools
+import json
+import time
+import traceback
+from collections.abc import Callable
 from typing import Any
+from typing import NamedTuple
 
-import aiohttp
-import async_lru
+from bot.db import connect
+from bot.http_session import get_session
+
+USERS_URL = 'https://api.twitch.tv/helix/users'
+
+# how long a helix response is fresh.  after that it is still served, but
+# refreshed in the background for next time
+USER_TTL = 24 * 60 * 60
+TTL = 60 * 60
+# user lookups are collected for this long, then fetched together
+BATCH_SECONDS = .05
+BATCH_SIZE = 100  # the most helix takes at once
+
+
+class _Entry(NamedTuple):
+    fetched: float
+    etag: str | None
+    data: Any
+
+
+# the db holds the responses across restarts, the most recently used are
+# kept here to save going to it
+MAX_ENTRIES = 4096
+_ENTRIES: collections.OrderedDict[str, _Entry] = collections.OrderedDict()
+# a url is only ever being fetched once at a time
+_FETCHING: dict[str, asyncio.Future[Any]] = {}
+
+
+def _headers(*, oauth_token: str, client_id: str) -> dict[str, str]:
+    return {
+        'Authorization': f'Bearer {oauth_token}',
+        'Client-ID': client_id,
+    }
+
+
+def _remember(url: str, entry: _Entry) -> None:
+    _ENTRIES[url] = entry
+    _ENTRIES.move_to_end(url)
+    while len(_ENTRIES) > MAX_ENTRIES:  # it is still in the db
+        _ENTRIES.popitem(last=False)
+
+
+async def _load(url: str) -> _Entry | None:
+    query = 'SELECT fetched, etag, data FROM helix_cache WHERE url = ?'
+    async with connect() as db:
+        async with db.execute(query, (url,)) as cursor:
+            row = await cursor.fetchone()
+    if row is None:
+        return None
+    else:
+        fetched, etag, data = row
+        return _Entry(fetched, etag, json.loads(data))
+
+
+async def _store(entries: dict[str, _Entry]) -> None:
+    query = 'INSERT OR REPLACE INTO helix_cache VALUES (?, ?, ?, ?)'
+    params = [
+        (url, entry.fetched, entry.etag, json.dumps(entry.data))
+        for url, entry in entries.items()
+    ]
+    async with connect() as db:
+        await db.executemany(query, params)
+        await db.commit()
+
+
+async def _fetch(url: str, *, oauth_token: str, client_id: str) -> Any:
+    headers = _headers(oauth_token=oauth_token, client_id=client_id)
+    cached = _ENTRIES.get(url)
+    if cached is not None and cached.etag is not None:
+        headers['If-None-Match'] = cached.etag
+
+    async with get_session().get(url, headers=headers) as resp:
+        if resp.status == 304 and cached is not None:
+            entry = cached._replace(fetched=time.time())
+        elif resp.status == 200:
+            data = await resp.json()
+            entry = _Entry(time.time(), resp.headers.get('ETag'), data)
+        else:  # don't remember errors
+            return await resp.json()
+
+    _remember(url, entry)
+    await _store({url: entry})
+    return entry.data
+
+
+def _fetch_done(url: str, fut: asyncio.Future[Any]) -> None:
+    del _FETCHING[url]
+    # whoever waits sees the error, don't warn if nobody did
+    if not fut.cancelled():
+        fut.exception()
+
+
+def _report_error(fut: asyncio.Future[Any]) -> None:
+    if not fut.cancelled():
+        exc = fut.exception()
+        if exc is not None:
+            traceback.print_exception(exc)
+
+
+def _start_fetch(
+        url: str,
+        *,
+        report: bool,
+        oauth_token: str,
+        client_id: str,
+) -> asyncio.Future[Any]:
+    fut = _FETCHING.get(url)
+    if fut is None:
+        coro = _fetch(url, oauth_token=oauth_token, client_id=client_id)
+        fut = _FETCHING[url] = asyncio.create_task(coro)
+        fut.add_done_callback(functools.partial(_fetch_done, url))
+        if report:
+            fut.add_done_callback(_report_error)
+    return fut
+
+
+async def _cached(
+        url: str,
+        *,
+        ttl: float,
+        fetch: Callable[..., asyncio.Future[Any]],
+) -> Any:
+    """`fetch(report=...)` starts (or joins) a fetch of `url`
+
+    errors go to whoever waits on it -- with `report` nobody does, so they
+    are printed instead.
+    """
+    entry = _ENTRIES.get(url)
+    if entry is not None:
+        _ENTRIES.move_to_end(url)
+    else:
+        entry = await _load(url)
+        # (unless a fetch finished meanwhile, that one is newer)
+        if entry is not None and url not in _ENTRIES:
+            _remember(url, entry)
+
+    if entry is None:
+        return await asyncio.shield(fetch(report=False))
+
+    if time.time() - entry.fetched > ttl:
+        fetch(report=True)
+    return entry.data
+
+
+async def helix_get(
+        url: str,
+        *,
+        ttl: float = TTL,
+        oauth_token: str,
+        client_id: str,
+) -> Any:
+    """the json at `url`, from the cache if it has ever been fetched
+
+    a stale response is returned as is and refreshed in the background.
+    """
+    return await _cached(
+        url,
+        ttl=ttl,
+        fetch=functools.partial(
+            _start_fetch, url, oauth_token=oauth_token, client_id=client_id,
+        ),
+    )
+
+
+def _user_url(login: str) -> str:
+    return f'{USERS_URL}?login={login}'
+
+
+class _UserBatch:
+    """user lookups made close together, fetched in one request"""
+
+    def __init__(self, *, oauth_token: str, client_id: str) -> None:
+        self.oauth_token = oauth_token
+        self.client_id = client_id
+        self.futures: dict[str, asyncio.Future[Any]] = {}
+        # whether any of them are refreshes, which nobody waits on
+        self.report = False
+        loop = asyncio.get_running_loop()
+        self.handle = loop.call_later(BATCH_SECONDS, self.flush)
+
+    def flush(self) -> None:
+        self.handle.cancel()
+        if _USER_BATCHES.get((self.oauth_token, self.client_id)) is self:
+            del _USER_BATCHES[self.oauth_token, self.client_id]
+        task = asyncio.create_task(self._fetch())
+        _TASKS.add(task)
+        task.add_done_callback(_TASKS.discard)
+
+    async def _fetch(self) -> None:
+        query = '&'.join(f'login={login}' for login in self.futures)
+        url = f'{USERS_URL}?{query}'
+        headers = _headers(
+            oauth_token=self.oauth_token, client_id=self.client_id,
+        )
+        try:
+            async with get_session().get(url, headers=headers) as resp:
+                status = resp.status
+                data = await resp.json()
+        except Exception as e:
+            if self.report:
+                traceback.print_exc()
+            for fut in self.futures.values():
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        if status != 200:  # don't remember errors
+            for fut in self.futures.values():
+                if not fut.done():
+                    fut.set_result(data)
+            return
+
+        users = {user['login']: user for user in data['data']}
+        now = time.time()
+        entries = {
+            _user_url(login): _Entry(
+                now, None, {'data': [users[login]] if login in users else []},
+            )
+            for login in self.futures
+        }
+        for user_url, entry in entries.items():
+            _remember(user_url, entry)
+        try:
+            await _store(entries)
+        except Exception:
+            # only the cache is lost, and nothing awaits this task to see it
+            traceback.print_exc()
+        for login, fut in self.futures.items():
+            if not fut.done():
+                fut.set_result(entries[_user_url(login)].data)
+
+
+# (oauth token, client id) => the batch being collected
+_USER_BATCHES: dict[tuple[str, str], _UserBatch] = {}
+_TASKS: set[asyncio.Task[None]] = set()
+
+
+def _batch_user(
+        login: str,
+        *,
+        report: bool,
+        oauth_token: str,
+        client_id: str,
+) -> asyncio.Future[Any]:
+    url = _user_url(login)
+    fut = _FETCHING.get(url)
+    if fut is not None:
+        return fut
+
+    batch = _USER_BATCHES.get((oauth_token, client_id))
+    if batch is None:
+        batch = _UserBatch(oauth_token=oauth_token, client_id=client_id)
+        _USER_BATCHES[oauth_token, client_id] = batch
+
+    fut = _FETCHING[url] = asyncio.get_running_loop().create_future()
+    fut.add_done_callback(functools.partial(_fetch_done, url))
+    batch.futures[login] = fut
+    batch.report = batch.report or report
+    if len(batch.futures) >= BATCH_SIZE:
+        batch.flush()
+    return fut
 
 
-@async_lru.alru_cache(maxsize=32)
 async def fetch_twitch_user(
         username: str,
         *,
         oauth_token: str,
         client_id: str,
 ) -> dict[str, Any] | None:
-    url = f'https://api.twitch.tv/helix/users?login={username}'
-    headers = {
-        'Authorization': f'Bearer {oauth_token}',
-        'Client-ID': client_id,
-    }
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as resp:
-            json_resp = await resp.json()
-            users = json_resp.get('data')
-            if users:
-                user, = users
-                return user
-            else:
-                return None
+    login = username.lower()
+    json_resp = await _cached(
+        _user_url(login),
+        ttl=USER_TTL,
+        fetch=functools.partial(
+            _batch_user, login, oauth_token=oauth_token, client_id=client_id,
+        ),
+    )
+    users = json_resp.get('data')
+    if users:
+        user, = users
+        return user
+    else:
+        return None
@@ -4,6 +4,7 @@ import asyncio.subprocess
 import contextlib
 import os.path
 import tempfile
+import uuid
 from collections.abc import Generator
 from typing import IO
 
@@ -41,6 +42,18 @@ def atomic_open(filename: str) -> Generator[IO[bytes]]:
         raise
 
 
+def atomic_symlink(dest: str, link: str) -> None:
+    """`ln -sf dest link` but `link` is never missing, even briefly"""
+    dirname, basename = os.path.split(link)
+    tmp_link = os.path.join(dirname, f'.{basename}.{uuid.uuid4().hex}')
+    os.symlink(dest, tmp_link)
+    try:
+        os.replace(tmp_link, link)
+    except BaseException:
+        os.remove(tmp_link)
+        raise
+
+
 async def check_call(*cmd: str) -> None:
     proc = await asyncio.subprocess.create_subprocess_exec(
         *cmd, stdout=asyncio.subprocess.DEVNULL,
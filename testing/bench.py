@@ -0,0 +1,241 @@
+"""micro benchmarks against a replayed chat corpus
+
+the corpus is raw irc lines (as received from twitch), one per line.  the
+output of `--verbose` works as well (lines starting with `> `).  if no corpus
+is given, a synthetic one is generated.
+
+usage: python -m testing.bench BENCHMARK [CORPUS]
+"""
+from __future__ import annotations
+
+import argparse
+import collections
+import itertools
+import random
+import re
+import timeit
+import tracemalloc
+from collections.abc import Callable
+
+from bot import data
+from bot import main as bot_main
+from bot.badges import BADGE_GLYPHS
+from bot.badges import badges_plain_text
+from bot.message import Message
+from bot.ranking import Leaderboard
+
+_SYNTHETIC_MSGS = (
+    'hello world',
+    'awcBongo awcBongo awcBongo',
+    'what editor is this?',
+    'i think this is cool',
+    'why are you using vim',
+    'LUL',
+    'is that windows?',
+    '!today',
+    '!chatrank',
+    '!pep8',
+    'PING',
+    'does anyone know how to install python on ubuntu',
+)
+_SYNTHETIC_BADGES = (
+    '',
+    'subscriber/12',
+    'moderator/1,subscriber/24',
+    'vip/1,bits/100',
+    'broadcaster/1,subscriber/0,partner/1',
+)
+
+
+def _synthetic(n: int) -> list[str]:
+    rand = random.Random(0)
+    ret = []
+    for _ in range(n):
+        user = f'user{rand.randrange(300)}'
+        info = (
+            f'@badges={rand.choice(_SYNTHETIC_BADGES)};color=;'
+            f'display-name={user};emotes=;id={rand.getrandbits(64):x}'
+        )
+        msg = rand.choice(_SYNTHETIC_MSGS)
+        ret.append(
+            f'{info} :{user}!{user}@{user}.tmi.twitch.tv '
+            f'PRIVMSG #channel :{msg}\r\n',
+        )
+    return ret
+
+
+def _corpus(filename: str | None) -> list[str]:
+    if filename is None:
+        return _synthetic(10000)
+
+    ret = []
+    with open(filename, encoding='UTF-8') as f:
+        for line in f:
+            if line.startswith('< '):
+                continue
+            ret.append(line.removeprefix('> '))
+    return ret
+
+
+def _report(
+        name: str,
+        n: int,
+        func: Callable[[], object],
+        *,
+        unit: str = 'line',
+) -> None:
+    best = min(timeit.repeat(func, number=1, repeat=5))
+    print(f'{name:>20}: {best * 1e9 / n:8.0f} ns/{unit} ({n} {unit}s)')
+
+
+def bench_badges(lines: list[str]) -> None:
+    msgs = [parsed for parsed in map(Message.parse, lines) if parsed]
+
+    def regex() -> None:  # previously: a regex per badge per glyph
+        for msg in msgs:
+            ret = ''
+            for name, s in BADGE_GLYPHS.items():
+                reg = re.compile(f'^{name}/')
+                for badge in msg.badges:
+                    if reg.match(badge):
+                        ret += s
+
+    def table() -> None:
+        for msg in msgs:
+            badges_plain_text.__wrapped__(msg.info['badges'])
+
+    def memoized() -> None:
+        for msg in msgs:
+            badges_plain_text(msg.info['badges'])
+
+    _report('regex', len(msgs), regex)
+    _report('table', len(msgs), table)
+    _report('memoized', len(msgs), memoized)
+
+
+def bench_input(lines: list[str]) -> None:
+    msgs = [parsed for parsed in map(Message.parse, lines) if parsed]
+    dt = bot_main.dt_str()
+
+    def rebuilt() -> None:  # previously: the template was rebuilt per line
+        for msg in msgs:
+            template = bot_main._input_template.__wrapped__(
+                msg.display_name,
+                msg.color,
+                msg.info['badges'],
+                msg.is_me,
+                msg.bg_color,
+            )
+            bot_main.get_printed_input(msg, dt, template)
+
+    def memoized() -> None:
+        for msg in msgs:
+            template = bot_main.get_input_template(msg)
+            bot_main.get_printed_input(msg, dt, template)
+
+    _report('rebuilt', len(msgs), rebuilt)
+    _report('memoized', len(msgs), memoized)
+
+
+def bench_dispatch(lines: list[str]) -> None:
+    msgs = [parsed.msg for parsed in map(Message.parse, lines) if parsed]
+
+    def linear() -> None:
+        for msg in msgs:
+            for pattern, _ in data.MSG_HANDLERS:
+                if pattern.match(msg):
+                    break
+
+    def compiled() -> None:
+        for msg in msgs:
+            data._match_msg_handler(msg)
+
+    _report('linear', len(msgs), linear)
+    _report('compiled', len(msgs), compiled)
+
+
+def bench_parse(lines: list[str]) -> None:
+    def twice() -> None:  # previously: once for display, once for dispatch
+        for line in lines:
+            Message.parse(line)
+            Message.parse(line)
+
+    def once() -> None:
+        for line in lines:
+            Message.parse(line)
+
+    _report('parse twice', len(lines), twice)
+    _report('parse once', len(lines), once)
+
+
+def bench_message(lines: list[str]) -> None:
+    msgs = [parsed for parsed in map(Message.parse, lines) if parsed]
+
+    def derived() -> None:
+        for msg in msgs:
+            msg.badges, msg.is_moderator, msg.is_subscriber
+            msg.color, msg.name_key
+
+    _report('derived properties', len(msgs), derived)
+
+    # keep the derived values alive so we can see what each one allocated
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    kept = [
+        (msg.badges, msg.is_moderator, msg.is_subscriber, msg.color)
+        for msg in msgs
+    ]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{"allocated":>20}: {(after - before) / len(kept):8.1f} B/msg')
+
+
+def bench_ranking(lines: list[str]) -> None:
+    # the corpus is too small to matter here, use 100k+ users
+    rand = random.Random(0)
+    counts = collections.Counter({
+        f'user{i}': int(rand.paretovariate(1)) for i in range(150_000)
+    })
+    users = rand.sample(sorted(counts), 100)
+    leaderboard = Leaderboard.from_counts(counts)
+
+    def most_common() -> None:  # previously: sort everyone, walk the ranks
+        for user in users:
+            grouped = itertools.groupby(
+                counts.most_common(), key=lambda pair: pair[1],
+            )
+            for _, (_, group) in enumerate(grouped, start=1):
+                if any(username == user for username, _ in group):
+                    break
+
+    def ranked() -> None:
+        for user in users:
+            leaderboard.rank(user)
+            leaderboard.increment(user)
+
+    _report('most_common', len(users), most_common, unit='lookup')
+    _report('leaderboard', len(users), ranked, unit='lookup')
+
+
+BENCHMARKS = {
+    'badges': bench_badges,
+    'dispatch': bench_dispatch,
+    'input': bench_input,
+    'message': bench_message,
+    'parse': bench_parse,
+    'ranking': bench_ranking,
+}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark', choices=BENCHMARKS)
+    parser.add_argument('corpus', nargs='?')
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](_corpus(args.corpus))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
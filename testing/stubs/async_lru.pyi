@@ -2,4 +2,8 @@ from typing import Callable, TypeVar
 
 T = TypeVar('T')
 
-def alru_cache(maxsize: int | None) -> Callable[[T], T]: ...
+def alru_cache(
+    maxsize: int | None,
+    *,
+    ttl: float | None = ...,
+) -> Callable[[T], T]: ...
@@ -0,0 +1,26 @@
+from __future__ import annotations
+
+import pytest
+
+from bot.badges import BADGE_GLYPHS
+from bot.badges import badges_plain_text
+
+
+@pytest.mark.parametrize(
+    ('badges', 'expected'),
+    (
+        ('', ''),
+        ('unknown/1', ''),
+        ('subscriber/12', BADGE_GLYPHS['subscriber']),
+        # displayed in table order, not the order twitch sends them
+        (
+            'subscriber/24,moderator/1',
+            BADGE_GLYPHS['moderator'] + BADGE_GLYPHS['subscriber'],
+        ),
+        # matched on the whole name
+        ('bits-leader/1', BADGE_GLYPHS['bits-leader']),
+        ('moderator', ''),
+    ),
+)
+def test_badges_plain_text(badges, expected):
+    assert badges_plain_text(badges) == expected
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import datetime
+from unittest import mock
+
+from bot.clock import Clock
+
+
+def _ts(*args):
+    return datetime.datetime(*args).timestamp()
+
+
+def test_clock_formats():
+    clock = Clock(lambda: _ts(2020, 1, 2, 3, 4, 5))
+    assert clock.dt_str() == '[03:04]'
+    assert clock.today() == datetime.date(2020, 1, 2)
+    assert clock.today_str() == '2020-01-02'
+
+
+def test_clock_formats_once_per_minute():
+    t = _ts(2020, 1, 2, 23, 59)
+    clock = Clock(lambda: t)
+    assert clock.dt_str() == '[23:59]'
+
+    t += 59
+    with mock.patch.object(datetime, 'datetime') as fake_datetime:
+        assert clock.dt_str() == '[23:59]'
+    fake_datetime.fromtimestamp.assert_not_called()
+
+    t += 1
+    assert clock.dt_str() == '[00:00]'
+    assert clock.today_str() == '2020-01-03'
+
+    # the clock was set back
+    t = _ts(2020, 1, 2, 12, 30, 30)
+    assert clock.dt_str() == '[12:30]'
+    assert clock.today_str() == '2020-01-02'
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import contextlib
+import datetime
+from collections.abc import AsyncGenerator
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Generator
+from unittest import mock
+
+import pytest
+from aiohttp import web
+
+from bot.clock import CLOCK
+from bot.config import Config
+from bot.data import get_fake_msg
+from bot.message import Message
+
+CONFIG = Config(
+    username='bot',
+    channel='channel',
+    oauth_token='oauth:token',
+    client_id='client_id',
+    airnow_api_key='',
+    openweathermap_api_key='',
+)
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+
+@contextlib.asynccontextmanager
+async def _stub_server(routes: dict[str, Handler]) -> AsyncGenerator[str]:
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(path, handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    try:
+        yield f'http://127.0.0.1:{runner.addresses[0][1]}'
+    finally:
+        await runner.cleanup()
+
+
+@pytest.fixture
+def stub_server():
+    """a local http server: `async with stub_server(routes) as base_url:`
+
+    `routes` maps paths to GET handlers
+    """
+    return _stub_server
+
+
+@pytest.fixture
+def config() -> Config:
+    """a config for `#channel`, without api keys"""
+    return CONFIG
+
+
+def _fake_msg(
+        s: str,
+        *,
+        user: str = 'user',
+        bits: int = 0,
+        mod: bool = False,
+) -> Message:
+    line = get_fake_msg(CONFIG, s, bits=bits, mod=mod, user=user)
+    parsed = Message.parse(line)
+    assert parsed is not None
+    return parsed
+
+
+@pytest.fixture
+def fake_msg():
+    """a parsed chat message in `config`'s channel:
+
+    `fake_msg('!cmd', user=..., bits=..., mod=...)`
+    """
+    return _fake_msg
+
+
+@contextlib.contextmanager
+def _fake_today(*dates: datetime.date) -> Generator[None]:
+    times = [
+        datetime.datetime.combine(date, datetime.time(12)).timestamp()
+        for date in dates
+    ]
+    it = iter(times)
+    with mock.patch.object(CLOCK, 'time_func', lambda: next(it, times[-1])):
+        yield
+
+
+@pytest.fixture
+def fake_today():
+    """`with fake_today(*dates):` the clock reads noon on each date in turn
+
+    it stays on the last one once they run out
+    """
+    return _fake_today
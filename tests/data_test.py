@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import re
+from unittest import mock
+
+import pytest
+
+from bot import data
+
+
+@pytest.fixture(autouse=True)
+def _clear_msg_handlers_re():
+    data._msg_handlers_re.cache_clear()
+    yield
+    data._msg_handlers_re.cache_clear()
+
+
+def _linear_match(msg):
+    for pattern, handler in data.MSG_HANDLERS:
+        if pattern.match(msg):
+            return handler
+    else:
+        return None
+
+
+@pytest.mark.parametrize(
+    'msg',
+    (
+        'hello world',
+        'PING',
+        'PING hello',
+        'ping',
+        '!pep8',
+        '!pep 8',
+        '!unknowncommand',
+        '!help',
+        'what is that keyboard?',
+        "What's the THEME",
+        'what editor is this',
+        'why vim',
+        'are you using NANO',
+        'i use arch linux btw',
+        'gnu/linux',
+        'i think so',
+        'THONKING',
+        'what are you working on',
+        'what is this os',
+    ),
+)
+def test_match_msg_handler_same_as_linear_scan(msg):
+    assert data._match_msg_handler(msg) is _linear_match(msg)
+
+
+def test_match_msg_handler_first_registered_wins():
+    async def first(config, msg):
+        raise NotImplementedError
+
+    async def second(config, msg):
+        raise NotImplementedError
+
+    handlers = [
+        (re.compile('.*bar', re.IGNORECASE), first),
+        (re.compile('foo(?P<x>.)'), second),
+        (re.compile('FOO'), first),
+    ]
+    with mock.patch.object(data, 'MSG_HANDLERS', handlers):
+        assert data._match_msg_handler('fooBAR') is first
+        assert data._match_msg_handler('foox') is second
+        assert data._match_msg_handler('FOO') is first
+        assert data._match_msg_handler('baz') is None
+
+
+def test_match_msg_handler_falls_back_when_uncombinable():
+    async def first(config, msg):
+        raise NotImplementedError
+
+    async def second(config, msg):
+        raise NotImplementedError
+
+    handlers = [
+        (re.compile('a(?P<x>b)'), first),
+        (re.compile('c(?P<x>d)'), second),
+    ]
+    with mock.patch.object(data, 'MSG_HANDLERS', handlers):
+        assert data._msg_handlers_re(len(handlers)) is None
+        assert data._match_msg_handler('cd') is second
+
+
+@pytest.mark.parametrize(
+    ('pattern', 'msg'),
+    (
+        (r'(.)\1', 'aa'),
+        (r'(a)?(?(1)b|c)', 'ab'),
+    ),
+)
+def test_match_msg_handler_falls_back_for_numbered_group_refs(pattern, msg):
+    async def first(config, msg):
+        raise NotImplementedError
+
+    async def second(config, msg):
+        raise NotImplementedError
+
+    # combined, `\1` would refer to `first`'s group instead
+    handlers = [
+        (re.compile('(x)'), first),
+        (re.compile(pattern), second),
+    ]
+    with mock.patch.object(data, 'MSG_HANDLERS', handlers):
+        assert data._msg_handlers_re(len(handlers)) is None
+        assert data._match_msg_handler(msg) is second
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from unittest import mock
+
+import pytest
+
+from bot import db
+from bot import migrations
+
+_MIGRATIONS = (('CREATE TABLE t (x INT NOT NULL)',),)
+
+
+def test_connect_outside_of_database():
+    async def f():
+        async with db.connect():
+            raise AssertionError('unreachable')
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(f())
+
+
+def test_database_migrates(tmp_path):
+    async def f():
+        async with db.database(str(tmp_path.joinpath('db.db'))):
+            for i in range(3):
+                async with db.connect() as conn:
+                    await conn.execute('INSERT INTO t VALUES (?)', (i,))
+                    await conn.commit()
+
+    with mock.patch.object(migrations, 'MIGRATIONS', _MIGRATIONS):
+        asyncio.run(f())
+
+    with sqlite3.connect(tmp_path.joinpath('db.db')) as conn:
+        journal_mode, = conn.execute('PRAGMA journal_mode').fetchone()
+        assert journal_mode == 'wal'
+        assert conn.execute('SELECT x FROM t').fetchall() == [(0,), (1,), (2,)]
+
+
+def test_connect_is_exclusive_and_rolls_back(tmp_path):
+    async def fails():
+        async with db.connect() as conn:
+            await conn.execute('INSERT INTO t VALUES (1)')
+            await asyncio.sleep(0)
+            raise ValueError('oops')
+
+    async def succeeds():
+        async with db.connect() as conn:
+            await conn.execute('INSERT INTO t VALUES (2)')
+            await conn.commit()
+
+    async def f():
+        async with db.database(str(tmp_path.joinpath('db.db'))):
+            res = await asyncio.gather(
+                fails(), succeeds(), return_exceptions=True,
+            )
+            assert isinstance(res[0], ValueError)
+            async with db.connect() as conn:
+                async with conn.execute('SELECT x FROM t') as cursor:
+                    return await cursor.fetchall()
+
+    with mock.patch.object(migrations, 'MIGRATIONS', _MIGRATIONS):
+        assert asyncio.run(f()) == [(2,)]
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import asyncio
+from unittest import mock
+
+from bot import executor as executor_mod
+from bot.executor import HandlerExecutor
+
+
+async def handler_a(config, msg):
+    raise NotImplementedError
+
+
+async def handler_b(config, msg):
+    raise NotImplementedError
+
+
+class _Tracker:
+    def __init__(self):
+        self.running = 0
+        self.max_running = 0
+        self.done = []
+        self.release = asyncio.Event()
+
+    def work(self, name):
+        async def work():
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                await self.release.wait()
+            finally:
+                self.running -= 1
+            self.done.append(name)
+        return work
+
+
+def test_executor_limits_concurrency():
+    async def f():
+        tracker = _Tracker()
+        executor = HandlerExecutor(limit=3, per_handler=10)
+        for i in range(10):
+            assert executor.submit(handler_a, tracker.work(i))
+        await asyncio.sleep(0)
+        assert (executor.running, executor.queued) == (3, 7)
+
+        tracker.release.set()
+        await executor.join()
+        return tracker, executor
+
+    tracker, executor = asyncio.run(f())
+    assert tracker.max_running == 3
+    assert tracker.done == list(range(10))
+    assert executor.completed == 10
+    assert executor.max_queued == 7
+
+
+def test_executor_per_handler_cap_does_not_block_others():
+    async def f():
+        tracker = _Tracker()
+        executor = HandlerExecutor(limit=10, per_handler=1)
+        executor.submit(handler_a, tracker.work('a1'))
+        executor.submit(handler_a, tracker.work('a2'))
+        executor.submit(handler_b, tracker.work('b1'))
+        await asyncio.sleep(0)
+        assert (executor.running, executor.queued) == (2, 1)
+
+        tracker.release.set()
+        await executor.join()
+        return tracker
+
+    tracker = asyncio.run(f())
+    assert tracker.done == ['a1', 'b1', 'a2']
+
+
+def test_executor_concurrency_limit_override():
+    async def f():
+        tracker = _Tracker()
+        executor = HandlerExecutor(limit=10, per_handler=1)
+        for i in range(3):
+            executor.submit(handler_a, tracker.work(i))
+        await asyncio.sleep(0)
+        running = executor.running
+        tracker.release.set()
+        await executor.join()
+        return running
+
+    with mock.patch.dict(executor_mod.HANDLER_CONCURRENCY, {handler_a: 2}):
+        assert asyncio.run(f()) == 2
+
+
+def test_executor_drops_and_coalesces():
+    async def f():
+        tracker = _Tracker()
+        executor = HandlerExecutor(limit=1, queue_size=2)
+        assert executor.submit(handler_a, tracker.work(0), key='k0')
+        assert executor.submit(handler_a, tracker.work(1), key='k1')
+        # same key as one already waiting
+        assert not executor.submit(handler_a, tracker.work(2), key='k1')
+        assert executor.submit(handler_a, tracker.work(3), key='k3')
+        # the line is full
+        assert not executor.submit(handler_a, tracker.work(4), key='k4')
+        # work without a key is never shed
+        assert executor.submit(handler_a, tracker.work(5))
+
+        tracker.release.set()
+        await executor.join()
+        return tracker, executor
+
+    tracker, executor = asyncio.run(f())
+    assert tracker.done == [0, 1, 3, 5]
+    assert (executor.dropped, executor.coalesced) == (1, 1)
+    assert executor.report() == (
+        'handlers: completed=4 running=0 queued=0 max queued=3 '
+        'dropped=1 coalesced=1'
+    )
+
+
+def test_executor_stop_cancels():
+    async def f():
+        tracker = _Tracker()
+        executor = HandlerExecutor(limit=1)
+        executor.submit(handler_a, tracker.work(0))
+        executor.submit(handler_a, tracker.work(1))
+        await asyncio.sleep(0)
+        await executor.stop()
+        return tracker, executor
+
+    tracker, executor = asyncio.run(f())
+    assert tracker.done == []
+    assert (executor.running, executor.queued) == (0, 0)
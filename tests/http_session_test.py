@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+from unittest import mock
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from bot import image_cache
+from bot.http_session import client_session
+from bot.http_session import get_session
+
+
+def test_get_session_outside_of_client_session():
+    with pytest.raises(RuntimeError):
+        get_session()
+
+
+async def _download_twice(stub_server):
+    peers = []
+
+    async def handle(request):
+        peers.append(request.transport.get_extra_info('peername'))
+        return web.Response(body=b'image')
+
+    async with stub_server({'/{name}.png': handle}) as base_url:
+        async with client_session() as session:
+            assert get_session() is session
+            for name in ('a', 'b'):
+                await image_cache.download(
+                    'emote', name, f'{base_url}/{name}.png',
+                )
+        assert session.closed
+
+    return peers
+
+
+def test_session_is_shared_and_kept_alive(tmp_path, stub_server):
+    with (
+            mock.patch.object(image_cache, 'CACHE', str(tmp_path)),
+            mock.patch.object(
+                image_cache, '_CACHE', image_cache.ImageCache(str(tmp_path)),
+            ),
+    ):
+        peers = asyncio.run(_download_twice(stub_server))
+
+    assert tmp_path.joinpath('emote', 'a.png').read_bytes() == b'image'
+    assert tmp_path.joinpath('emote', 'b.png').read_bytes() == b'image'
+    # both requests went over the same pooled connection
+    assert len(peers) == 2
+    assert peers[0] == peers[1]
+
+
+def test_offline_session_does_not_resolve():
+    async def fetch():
+        async with client_session(offline=True) as session:
+            async with session.get('https://example.com'):
+                raise AssertionError('unreachable')
+
+    with pytest.raises(aiohttp.ClientConnectorError):
+        asyncio.run(fetch())
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import os.path
+from unittest import mock
+
+import pytest
+from aiohttp import web
+
+from bot import image_cache
+from bot.http_session import client_session
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path):
+    with (
+            mock.patch.object(image_cache, 'CACHE', str(tmp_path)),
+            mock.patch.object(
+                image_cache, '_CACHE', image_cache.ImageCache(str(tmp_path)),
+            ),
+    ):
+        yield tmp_path
+
+
+async def _serve(stub_server, func, *, delay=0.):
+    requests = []
+
+    async def handle(request):
+        requests.append(request.match_info['name'])
+        await asyncio.sleep(delay)
+        return web.Response(body=b'image')
+
+    async with stub_server({'/{name}.png': handle}) as base_url:
+        async with client_session():
+            await func(base_url)
+    return requests
+
+
+def test_concurrent_downloads_are_coalesced(cache_dir, stub_server):
+    async def func(base):
+        await asyncio.gather(*(
+            image_cache.download('emote', 'Kappa', f'{base}/Kappa.png')
+            for _ in range(10)
+        ))
+
+    requests = asyncio.run(_serve(stub_server, func, delay=.05))
+
+    assert requests == ['Kappa']
+    assert cache_dir.joinpath('emote', 'Kappa.png').read_bytes() == b'image'
+    assert not image_cache._IN_FLIGHT
+
+
+def test_present_images_skip_the_filesystem(cache_dir, stub_server):
+    async def func(base):
+        await image_cache.download('emote', 'Kappa', f'{base}/Kappa.png')
+        with mock.patch.object(os.path, 'exists') as exists:
+            await image_cache.download('emote', 'Kappa', f'{base}/Kappa.png')
+        exists.assert_not_called()
+
+    assert asyncio.run(_serve(stub_server, func)) == ['Kappa']
+
+
+def test_cancelled_waiter_does_not_cancel_download(cache_dir, stub_server):
+    async def func(base):
+        url = f'{base}/Kappa.png'
+        first = asyncio.ensure_future(image_cache.download('emote', 'a', url))
+        second = asyncio.ensure_future(image_cache.download('emote', 'a', url))
+        await asyncio.sleep(.01)
+        first.cancel()
+        await second
+
+    asyncio.run(_serve(stub_server, func, delay=.05))
+
+    assert cache_dir.joinpath('emote', 'a.png').read_bytes() == b'image'
+
+
+def test_get_cache_before_load():
+    with mock.patch.object(image_cache, '_CACHE', None):
+        with pytest.raises(RuntimeError):
+            image_cache.get_cache()
+
+
+def _write(path, size, mtime):
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(b'x' * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_scan_orders_by_mtime_and_evicts(cache_dir):
+    _write(cache_dir.joinpath('emote', 'old.png'), 10, 1000)
+    _write(cache_dir.joinpath('badge', 'new.png'), 10, 3000)
+    _write(cache_dir.joinpath('emote', 'mid.png'), 10, 2000)
+    cache_dir.joinpath('.gitignore').write_text('*\n')
+
+    cache = image_cache.ImageCache(str(cache_dir), budget=25)
+    cache.scan()
+
+    assert len(cache) == 2
+    assert cache.size == 20
+    assert cache.evictions == 1
+    assert not cache_dir.joinpath('emote', 'old.png').exists()
+    assert cache_dir.joinpath('emote', 'mid.png').exists()
+
+
+def test_least_recently_used_is_evicted(cache_dir):
+    for name in ('a', 'b'):
+        _write(cache_dir.joinpath('emote', f'{name}.png'), 10, 1000)
+    a = os.path.join(cache_dir, 'emote', 'a.png')
+    b = os.path.join(cache_dir, 'emote', 'b.png')
+
+    cache = image_cache.ImageCache(str(cache_dir), budget=20)
+    cache.add(a, 10)
+    cache.add(b, 10)
+    assert cache.get(a)  # now b is the least recently used
+    assert not cache.get(os.path.join(cache_dir, 'emote', 'c.png'))
+
+    _write(cache_dir.joinpath('emote', 'c.png'), 10, 1000)
+    cache.add(os.path.join(cache_dir, 'emote', 'c.png'), 10)
+
+    assert not os.path.exists(b)
+    assert os.path.exists(a)
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 1)
+    assert cache.report() == (
+        'image cache: 2 images 0.0MiB of 0MiB hit rate=50.0% evictions=1'
+    )
+
+
+def test_hit_refreshes_stale_mtime(cache_dir):
+    path = cache_dir.joinpath('emote', 'a.png')
+    _write(path, 10, 1000)
+
+    cache = image_cache.ImageCache(str(cache_dir))
+    cache.scan()
+    assert cache.get(str(path))
+
+    assert path.stat().st_mtime > 1000
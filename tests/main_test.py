@@ -0,0 +1,212 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from unittest import mock
+
+import pytest
+
+from bot import main as main_mod
+from bot.main import LogWriter
+from bot.message import Message
+from bot.outbound import RATE
+from bot.outbound import RATE_MODERATOR
+from bot.outbound import SendQueue
+from bot.replay import REPLAY_HOST
+from bot.replay import ReplayServer
+
+
+@pytest.fixture
+def log_lines():
+    ret: list[str] = []
+    with mock.patch.object(main_mod, 'LOG_LINE_HANDLERS', [ret.append]):
+        yield ret
+
+
+def test_log_writer_buffers_and_writes_on_close(
+        tmp_path, monkeypatch, log_lines,
+):
+    monkeypatch.chdir(tmp_path)
+
+    async def main():
+        log_writer = LogWriter()
+        log_writer.write_message('[01:23]<\033[1mfoo\033[m> hello')
+        log_writer.write_message('[01:23]<bar> world')
+        assert not tmp_path.joinpath('logs').exists()
+        log_writer.close()
+
+    asyncio.run(main())
+
+    assert log_lines == ['[01:23]<foo> hello', '[01:23]<bar> world']
+    log, = tmp_path.joinpath('logs').iterdir()
+    assert log.name == f'{datetime.date.today()}.log'
+    assert log.read_text() == '[01:23]<foo> hello\n[01:23]<bar> world\n'
+
+
+def test_log_writer_reports_write_errors(
+        tmp_path, monkeypatch, capsys, log_lines, fake_today,
+):
+    monkeypatch.chdir(tmp_path)
+    tmp_path.joinpath('logs').write_text('not a directory')
+
+    async def main():
+        d1, d2 = datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)
+        with fake_today(d1, d1, d2):
+            log_writer = LogWriter()
+            log_writer.write_message('1')
+            log_writer.write_message('2')  # written from the thread
+        log_writer._buf.clear()
+        log_writer.close()
+
+    asyncio.run(main())
+
+    assert 'FileExistsError' in capsys.readouterr().err
+
+
+def test_log_writer_rotates_on_date_change(
+        tmp_path, monkeypatch, log_lines, fake_today,
+):
+    monkeypatch.chdir(tmp_path)
+
+    async def main():
+        d1, d2 = datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)
+        with fake_today(d1, d1, d1, d2):
+            log_writer = LogWriter()
+            log_writer.write_message('1')
+            log_writer.write_message('2')
+            log_writer.write_message('3')
+        log_writer.close()
+
+    asyncio.run(main())
+
+    logs = tmp_path.joinpath('logs')
+    assert logs.joinpath('2020-01-01.log').read_text() == '1\n2\n'
+    assert logs.joinpath('2020-01-02.log').read_text() == '3\n'
+
+
+def _msg(**info):
+    info = {'badges': 'subscriber/12', 'color': '#FF0000', **info}
+    info.setdefault('display-name', 'Foo')
+    return Message(msg='hi', is_me=False, channel='c', info=info)
+
+
+def test_input_template_is_reused_until_tags_change():
+    template = main_mod.get_input_template(_msg())
+    assert main_mod.get_input_template(_msg()) is template
+
+    recolored = main_mod.get_input_template(_msg(color='#00FF00'))
+    assert recolored is not template
+    assert '38;2;0;255;0m' in recolored.head
+
+    rebadged = main_mod.get_input_template(_msg(badges='moderator/1'))
+    assert rebadged.badges != template.badges
+
+
+def test_get_printed_input():
+    msg = _msg()
+    template = main_mod.get_input_template(msg)
+    to_print, to_log = main_mod.get_printed_input(msg, '[01:23]', template)
+    assert to_log == f'[01:23]{template.badges}{template.head}hi'
+    assert to_print == f'[01:23]{template.badges}{template.head}hi\033[m'
+
+
+def test_backoff():
+    assert [main_mod._backoff(n) for n in (1, 2, 3)] == [1, 2, 4]
+    assert main_mod._backoff(100) == main_mod.BACKGROUND_BACKOFF[1]
+    assert main_mod._backoff(100000) == main_mod.BACKGROUND_BACKOFF[1]
+
+
+def test_failing_background_handler_backs_off():
+    times = []
+
+    async def handler(config, msg):
+        times.append(asyncio.get_running_loop().time())
+        if len(times) <= 2:
+            raise ValueError('oops')
+        await asyncio.Event().wait()  # up and running
+
+    async def run(func):
+        try:
+            await func(None, None)
+        except ValueError:
+            pass
+
+    async def f():
+        scheduler, (task,) = main_mod._start_periodic(run)
+        while len(times) < 3:
+            await asyncio.sleep(.005)
+        task.cancel()
+        await scheduler.stop()
+
+    with (
+            mock.patch.object(main_mod, 'BACKGROUND_BACKOFF', (.02, .03)),
+            mock.patch.object(main_mod, 'BACKGROUND_HANDLERS', [handler]),
+            mock.patch.object(main_mod, 'PERIODIC_HANDLERS', []),
+    ):
+        asyncio.run(asyncio.wait_for(f(), timeout=5))
+
+    # (less a little for the event loop's clock resolution)
+    assert times[1] - times[0] >= .019
+    assert times[2] - times[1] >= .029
+
+
+def test_handle_response_drops_coalesced_replies(config):
+    renderer = mock.Mock()
+    log_writer = mock.Mock()
+    send_queue = SendQueue()
+
+    async def handler(config, msg):
+        return 'PRIVMSG #channel :hello\r\n'
+
+    async def f():
+        for _ in range(2):
+            await main_mod.handle_response(
+                config, _msg(), handler, send_queue, renderer, log_writer,
+            )
+
+    asyncio.run(f())
+
+    # the second is still waiting to be sent: not queued, shown or logged
+    assert send_queue.queued == 1
+    assert send_queue.coalesced == 1
+    renderer.put.assert_called_once()
+    log_writer.write_message.assert_called_once()
+
+
+def test_userstate_sets_moderator(
+        tmp_path, monkeypatch, capsys, config, log_lines,
+):
+    monkeypatch.chdir(tmp_path)
+    lines = [
+        b':tmi.twitch.tv CAP * ACK :twitch.tv/tags twitch.tv/commands\r\n',
+        b'@emote-only=0;room-id=1 :tmi.twitch.tv ROOMSTATE #channel\r\n',
+        b'@badges=moderator/1;mod=1 :tmi.twitch.tv USERSTATE #channel\r\n',
+    ]
+    send_queue = SendQueue()
+
+    async def f():
+        async with ReplayServer(lines, rate=None) as server:
+            bot = asyncio.create_task(
+                main_mod.amain(
+                    config,
+                    quiet=False,
+                    images=False,
+                    host=REPLAY_HOST,
+                    port=server.port,
+                    ssl=False,
+                    send_queue=send_queue,
+                    offline=True,
+                ),
+            )
+            await asyncio.wait_for(asyncio.shield(server.done), timeout=5)
+            bot.cancel()
+            await asyncio.gather(bot, return_exceptions=True)
+
+    assert send_queue.bucket.capacity == RATE[0]
+    asyncio.run(f())
+    assert send_queue.bucket.capacity == RATE_MODERATOR[0]
+
+    out = capsys.readouterr().out
+    assert 'UNHANDLED: :tmi.twitch.tv CAP' in out
+    assert 'ROOMSTATE' not in out
+    assert 'USERSTATE' not in out
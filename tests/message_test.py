@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import pytest
+
+from bot.message import Message
+from bot.message import parse_tags
+from bot.message import unescape_tag
+
+
+@pytest.mark.parametrize(
+    ('s', 'expected'),
+    (
+        ('', ''),
+        ('hello', 'hello'),
+        (r'hello\sworld', 'hello world'),
+        (r'a\:b', 'a;b'),
+        (r'a\\b', 'a\\b'),
+        (r'a\r\nb', 'a\r\nb'),
+        (r'a\bc', 'abc'),
+        ('trailing\\', 'trailing'),
+    ),
+)
+def test_unescape_tag(s, expected):
+    assert unescape_tag(s) == expected
+
+
+def test_parse_tags():
+    ret = parse_tags(r'badges=;color=#FF0000;system-msg=hi\sthere;flag')
+    assert ret == {
+        'badges': '',
+        'color': '#FF0000',
+        'system-msg': 'hi there',
+        'flag': '',
+    }
+
+
+def test_message_parse():
+    line = (
+        '@badges=moderator/1;color=;display-name=Foo '
+        ':foo!foo@foo.tmi.twitch.tv PRIVMSG #bar :\x01ACTION hello\x01\r\n'
+    )
+    ret = Message.parse(line)
+    assert ret == Message(
+        msg='hello\x01',
+        is_me=True,
+        channel='bar',
+        info={'badges': 'moderator/1', 'color': '', 'display-name': 'Foo'},
+    )
+    assert ret.is_moderator
+
+
+def test_message_parse_not_privmsg():
+    assert Message.parse('PING :tmi.twitch.tv\r\n') is None
+
+
+@pytest.mark.parametrize(
+    ('badges', 'moderator', 'subscriber'),
+    (
+        ('', False, False),
+        ('moderator/1', True, False),
+        ('founder/0', False, True),
+        ('vip/1,subscriber/12', False, True),
+        ('moderator/1,subscriber/24', True, True),
+    ),
+)
+def test_message_badges(badges, moderator, subscriber):
+    info = {'badges': badges, 'color': '', 'display-name': 'foo'}
+    msg = Message(msg='hi', is_me=False, channel='bar', info=info)
+    assert msg.is_moderator is moderator
+    assert msg.is_subscriber is subscriber
+
+
+def test_message_color():
+    info = {'badges': '', 'color': '#FF8000', 'display-name': 'foo'}
+    msg = Message(msg='hi', is_me=False, channel='bar', info=info)
+    assert msg.color == (255, 128, 0)
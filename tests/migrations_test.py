@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+from unittest import mock
+
+import aiosqlite
+import pytest
+
+from bot import migrations
+
+
+def _migrate(filename):
+    async def f():
+        async with aiosqlite.connect(filename) as db:
+            return await migrations.migrate(db)
+
+    return asyncio.run(f())
+
+
+def test_migrate_empty_database(tmp_path):
+    filename = tmp_path.joinpath('db.db')
+
+    assert _migrate(filename) == len(migrations.MIGRATIONS)
+    # already up to date: nothing is re-run
+    assert _migrate(filename) == len(migrations.MIGRATIONS)
+
+    with sqlite3.connect(filename) as db:
+        query = 'SELECT version FROM schema_version'
+        versions = [version for version, in db.execute(query)]
+        assert versions == list(range(1, len(migrations.MIGRATIONS) + 1))
+
+
+def test_migrate_applies_only_new_migrations(tmp_path):
+    filename = tmp_path.joinpath('db.db')
+    first = (('CREATE TABLE t (x INT NOT NULL)',),)
+    second = (*first, ('CREATE INDEX t_x_idx ON t (x)',))
+
+    with mock.patch.object(migrations, 'MIGRATIONS', first):
+        assert _migrate(filename) == 1
+    with mock.patch.object(migrations, 'MIGRATIONS', second):
+        assert _migrate(filename) == 2
+
+    with sqlite3.connect(filename) as db:
+        query = "SELECT name FROM sqlite_master WHERE type = 'index'"
+        assert ('t_x_idx',) in db.execute(query).fetchall()
+
+
+def test_migrate_database_created_before_migrations(tmp_path):
+    filename = tmp_path.joinpath('db.db')
+    with sqlite3.connect(filename) as db:
+        db.execute(
+            'CREATE TABLE motd ('
+            '   user TEXT NOT NULL,'
+            '   msg TEXT NOT NULL,'
+            '   points INT NOT NULL,'
+            '   timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP'
+            ')',
+        )
+        db.execute("INSERT INTO motd (user, msg, points) VALUES ('a', 'b', 1)")
+
+    assert _migrate(filename) == len(migrations.MIGRATIONS)
+
+    with sqlite3.connect(filename) as db:
+        assert db.execute('SELECT msg FROM motd').fetchall() == [('b',)]
+        query = 'EXPLAIN QUERY PLAN SELECT COUNT(1) FROM motd WHERE msg = ?'
+        (*_, plan), = db.execute(query, ('b',)).fetchall()
+        assert 'motd_msg_idx' in plan
+
+
+def test_failed_migration_is_rolled_back(tmp_path):
+    filename = tmp_path.joinpath('db.db')
+    first = (('CREATE TABLE t (x INT NOT NULL)',),)
+    broken = (
+        *first,
+        ('CREATE TABLE u (x INT NOT NULL)', 'CREATE INDEX u_x_idx ON v (x)'),
+    )
+    fixed = (
+        *first,
+        ('CREATE TABLE u (x INT NOT NULL)', 'CREATE INDEX u_x_idx ON u (x)'),
+    )
+
+    with mock.patch.object(migrations, 'MIGRATIONS', broken):
+        with pytest.raises(sqlite3.OperationalError):
+            _migrate(filename)
+
+    with sqlite3.connect(filename) as db:
+        query = 'SELECT version FROM schema_version'
+        assert db.execute(query).fetchall() == [(1,)]
+        query = "SELECT name FROM sqlite_master WHERE name = 'u'"
+        assert db.execute(query).fetchall() == []
+
+    # so the fixed migration applies cleanly
+    with mock.patch.object(migrations, 'MIGRATIONS', fixed):
+        assert _migrate(filename) == 2
+
+
+def test_vim_bits_leaderboard_uses_an_index(tmp_path):
+    filename = tmp_path.joinpath('db.db')
+    _migrate(filename)
+
+    with sqlite3.connect(filename) as db:
+        query = (
+            'EXPLAIN QUERY PLAN '
+            'SELECT LOWER(user), SUM(bits) FROM vim_bits GROUP BY LOWER(user)'
+        )
+        plan = [detail for *_, detail in db.execute(query)]
+        assert plan == ['SCAN vim_bits USING INDEX vim_bits_lower_user_idx']
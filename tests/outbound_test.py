@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+
+from bot.outbound import SendQueue
+from bot.outbound import TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_window():
+    clock = FakeClock()
+    bucket = TokenBucket(2, 30, clock=clock)
+    bucket.take()
+    clock.now = 10
+    bucket.take()
+    assert bucket.delay() == 20
+
+    # only the first token is back, not a full burst
+    clock.now = 30
+    assert bucket.delay() == 0
+    bucket.take()
+    assert bucket.delay() == 10
+
+
+def test_token_bucket_capacity_shrinks():
+    clock = FakeClock()
+    bucket = TokenBucket(3, 30, clock=clock)
+    for _ in range(3):
+        bucket.take()
+    bucket.capacity = 1
+    clock.now = 5
+    # all but one of the spent tokens must come back first
+    assert bucket.delay() == 25
+
+
+async def _drain(send_queue: SendQueue) -> None:
+    while send_queue.queued:
+        await asyncio.sleep(0)
+
+
+def test_send_queue_pong_first_and_coalesces():
+    sent: list[str] = []
+
+    async def send(line: str) -> None:
+        sent.append(line)
+
+    async def main():
+        send_queue = SendQueue()
+        assert send_queue.put('PRIVMSG #c :hi\r\n')
+        assert send_queue.put('PRIVMSG #c :bye\r\n')
+        assert not send_queue.put('PRIVMSG #c :hi\r\n')
+        assert send_queue.put('PONG :tmi.twitch.tv\r\n')
+        send_queue.start(send)
+        await _drain(send_queue)
+        await send_queue.stop()
+        return send_queue
+
+    send_queue = asyncio.run(main())
+
+    assert sent == [
+        'PONG :tmi.twitch.tv\r\n',
+        'PRIVMSG #c :hi\r\n',
+        'PRIVMSG #c :bye\r\n',
+    ]
+    assert send_queue.sent == 3
+    assert send_queue.coalesced == 1
+
+
+def test_send_queue_rate_limited():
+    sent: list[str] = []
+
+    async def send(line: str) -> None:
+        sent.append(line)
+
+    async def main():
+        send_queue = SendQueue()
+        send_queue.bucket = TokenBucket(1, 60)
+        send_queue.start(send)
+        send_queue.put('PRIVMSG #c :1\r\n')
+        send_queue.put('PRIVMSG #c :2\r\n')
+        await asyncio.sleep(.01)
+        # PONGs aren't held up behind the limited messages
+        send_queue.put('PONG :tmi.twitch.tv\r\n')
+        await asyncio.sleep(.01)
+        assert send_queue.queued == 1
+        await send_queue.stop()
+
+    asyncio.run(main())
+
+    assert sent == ['PRIVMSG #c :1\r\n', 'PONG :tmi.twitch.tv\r\n']
+
+
+def test_send_queue_moderator_budget():
+    send_queue = SendQueue()
+    assert send_queue.bucket.capacity == 20
+    send_queue.set_moderator(True)
+    assert send_queue.bucket.capacity == 100
+    send_queue.set_moderator(False)
+    assert send_queue.bucket.capacity == 20
+
+
+def test_send_queue_stops_as_it_is_woken():
+    async def send(line: str) -> None:
+        pass
+
+    async def main():
+        send_queue = SendQueue()
+        send_queue.bucket = TokenBucket(1, 60)
+        send_queue.start(send)
+        send_queue.put('PRIVMSG #c :1\r\n')
+        send_queue.put('PRIVMSG #c :2\r\n')
+        await asyncio.sleep(.01)  # waiting for the rate limit
+        # woken in the same loop iteration it is cancelled in
+        send_queue.put('PONG :tmi.twitch.tv\r\n')
+        await asyncio.wait_for(send_queue.stop(), timeout=1)
+
+    asyncio.run(main())
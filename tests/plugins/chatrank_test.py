@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import datetime
 from collections import Counter
 from unittest.mock import patch
 
 import pytest
 
 from bot.plugins import chatrank
+from bot.ranking import Leaderboard
 
 
 @pytest.mark.parametrize(
@@ -60,7 +62,8 @@ from bot.plugins import chatrank
     ),
 )
 def test_user_rank_by_line_type(username, counts, expected):
-    with patch.object(chatrank, '_chat_rank_counts', return_value=counts):
+    leaderboard = Leaderboard.from_counts(counts)
+    with patch.object(chatrank, '_leaderboard', return_value=leaderboard):
         # the second parameter does not really affect the ranking logic,
         # so we always use chatrank.CHAT_LOG_RE
         ret = chatrank._user_rank_by_line_type(username, chatrank.CHAT_LOG_RE)
@@ -117,8 +120,138 @@ def test_user_rank_by_line_type(username, counts, expected):
     ),
 )
 def test_top_n_rank_by_line_type(counts, n, expected):
-    with patch.object(chatrank, '_chat_rank_counts', return_value=counts):
+    leaderboard = Leaderboard.from_counts(counts)
+    with patch.object(chatrank, '_leaderboard', return_value=leaderboard):
         # the second parameter does not really affect the ranking logic,
         # so we always use chatrank.CHAT_LOG_RE
         ret = chatrank._top_n_rank_by_line_type(chatrank.CHAT_LOG_RE, n=n)
         assert ret == expected
+
+
+def _counts(index, reg):
+    return Counter(index.leaderboard(reg).counts)
+
+
+def test_log_index(tmp_path, fake_today):
+    logs = tmp_path.joinpath('logs')
+    logs.mkdir()
+    logs.joinpath('2020-01-01.log').write_text(
+        '[01:00]<Foo> hello\n'
+        '[01:01]<bar> !bonk foo\n'
+        '[01:02] * kmjao waves\n',
+    )
+    today = logs.joinpath('2020-01-02.log')
+    today.write_text('[01:00]<foo> hi\n[01:01]<foo> partial')
+
+    def _index():
+        index = chatrank.LogIndex(str(tmp_path.joinpath('i.db')), str(logs))
+        with fake_today(datetime.date(2020, 1, 2)):
+            index.add(index.load_history())
+        return index
+
+    index = _index()
+    assert _counts(index, chatrank.CHAT_LOG_RE) == Counter({
+        'foo': 2, 'bar': 1, 'hovsater': 1,
+    })
+    assert _counts(index, chatrank.BONKER_RE) == Counter({'bar': 1})
+    assert _counts(index, chatrank.BONKED_RE) == Counter({'foo': 1})
+
+    # history is only loaded once
+    with open(today, 'a') as f:
+        f.write(' line\n[01:02]<bar> !bonk\n')
+    assert index.load_history() == {}
+
+    # a new process picks up where the last one left off
+    index = _index()
+    assert _counts(index, chatrank.CHAT_LOG_RE) == Counter({
+        'foo': 3, 'bar': 2, 'hovsater': 1,
+    })
+    assert _counts(index, chatrank.BONKER_RE) == Counter({'bar': 2})
+
+    assert index.daily_chat_counts('hovsater') == Counter({
+        '2020-01-01.log': 1,
+    })
+
+    # and does not re-read complete logs
+    logs.joinpath('2020-01-01.log').write_text('')
+    index = _index()
+    assert _counts(index, chatrank.CHAT_LOG_RE) == Counter({
+        'foo': 3, 'bar': 2, 'hovsater': 1,
+    })
+
+
+def test_log_index_live(tmp_path, fake_today):
+    logs = tmp_path.joinpath('logs')
+    logs.mkdir()
+    today = logs.joinpath('2020-01-02.log')
+    today.write_text('[01:00]<foo> hi\n')
+
+    index = chatrank.LogIndex(str(tmp_path.joinpath('i.db')), str(logs))
+    with fake_today(datetime.date(2020, 1, 2)):
+        index.start_live()
+        # logged by this process after startup: counted live, not re-read
+        with open(today, 'a') as f:
+            f.write('[01:01]<bar> !bonk foo\n')
+        index.add_line('[01:01]<bar> !bonk foo')
+
+        assert _counts(index, chatrank.CHAT_LOG_RE) == Counter({'bar': 1})
+        index.add(index.load_history())
+        assert _counts(index, chatrank.CHAT_LOG_RE) == Counter({
+            'foo': 1, 'bar': 1,
+        })
+        assert _counts(index, chatrank.BONKED_RE) == Counter({'foo': 1})
+        assert index.daily_chat_counts('bar') == Counter({'2020-01-02.log': 1})
+
+    # the next process picks up the lines that were counted live
+    index = chatrank.LogIndex(str(tmp_path.joinpath('i.db')), str(logs))
+    with fake_today(datetime.date(2020, 1, 3)):
+        index.add(index.load_history())
+    counts = _counts(index, chatrank.CHAT_LOG_RE)
+    assert counts == Counter({'foo': 1, 'bar': 1})
+
+
+def test_log_index_created_on_first_line(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with patch.object(chatrank, '_LOG_INDEX', None):
+        chatrank._add_log_line('[01:00]<foo> hi')
+        index = chatrank._log_index()
+        assert index is chatrank._LOG_INDEX
+        assert _counts(index, chatrank.CHAT_LOG_RE) == Counter({'foo': 1})
+    assert not tmp_path.joinpath('chatrank.db').exists()
+
+
+def test_log_index_creates_tables_once(tmp_path):
+    logs = tmp_path.joinpath('logs')
+    logs.mkdir()
+    index = chatrank.LogIndex(str(tmp_path.joinpath('i.db')), str(logs))
+    with patch.object(
+            index, '_create_tables', wraps=index._create_tables,
+    ) as create_tables:
+        index.add(index.load_history())
+        assert index.daily_chat_counts('foo') == Counter()
+        assert index.daily_chat_counts('bar') == Counter()
+    create_tables.assert_called_once()
+
+
+def test_log_index_without_logs(tmp_path):
+    logs = tmp_path.joinpath('logs')  # not made until a line is logged
+    index = chatrank.LogIndex(str(tmp_path.joinpath('i.db')), str(logs))
+    index.add(index.load_history())
+    assert _counts(index, chatrank.CHAT_LOG_RE) == Counter()
+
+
+def test_log_start_date(tmp_path, monkeypatch, fake_today):
+    monkeypatch.chdir(tmp_path)
+    with (
+            patch.object(chatrank, '_LOG_START_DATE', None),
+            fake_today(datetime.date(2020, 1, 3)),
+    ):
+        assert chatrank._log_start_date() == '2020-01-03'
+        tmp_path.joinpath('logs').mkdir()
+        assert chatrank._log_start_date() == '2020-01-03'
+
+        tmp_path.joinpath('logs', '2020-01-02.log').touch()
+        tmp_path.joinpath('logs', '2020-01-01.log').touch()
+        assert chatrank._log_start_date() == '2020-01-01'
+        tmp_path.joinpath('logs', '2020-01-01.log').unlink()
+        assert chatrank._log_start_date() == '2020-01-01'
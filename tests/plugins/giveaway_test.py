@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+import asyncio
+
+from bot.db import database
+from bot.plugins import giveaway
+
+
+def test_giveaway_can_run_twice(tmp_path, config, fake_msg):
+    async def f():
+        ret = []
+        async with database(str(tmp_path.joinpath('db.db'))):
+            for _ in range(2):
+                start = fake_msg('!giveawaystart', mod=True)
+                await giveaway.givewawaystart(config, start)
+                await giveaway.giveaway(config, fake_msg('!giveaway'))
+                end = fake_msg('!giveawayend', mod=True)
+                ret.append(await giveaway.giveawayend(config, end))
+            ret.append(await giveaway.giveaway(config, fake_msg('!giveaway')))
+        return ret
+
+    first, second, after = asyncio.run(f())
+    assert first == second == (
+        'PRIVMSG #channel : !giveaway winner is user\r\n'
+    )
+    assert after == (
+        'PRIVMSG #channel : no current giveaway active!\r\n'
+    )
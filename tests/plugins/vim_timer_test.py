@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+from unittest import mock
+
+import pytest
+
+from bot.db import connect
+from bot.db import database
+from bot.plugins import vim_timer
+
+
+@pytest.fixture(autouse=True)
+def _reset_state():
+    with (
+            mock.patch.object(vim_timer, '_VIM_TIMER', None),
+            mock.patch.object(vim_timer, '_BITS_LEADERBOARD', None),
+    ):
+        yield
+
+
+@pytest.fixture
+def set_symlink():
+    with mock.patch.object(vim_timer, '_set_symlink') as set_symlink:
+        set_symlink.return_value = False
+        yield set_symlink
+
+
+def test_timer_expires_on_schedule():
+    async def f():
+        end = datetime.datetime.now() + datetime.timedelta(seconds=.1)
+        timer = vim_timer.VimTimer(enabled=True, end=end)
+        await timer.wait_changed()  # startup
+        assert timer.time_left() == 0  # less than a whole second
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await timer.wait_changed()
+        return loop.time() - start
+
+    assert .05 < asyncio.run(f()) < 1
+
+
+def test_timer_rearmed_on_change():
+    async def f():
+        timer = vim_timer.VimTimer(enabled=True, end=None)
+        await timer.wait_changed()  # startup
+
+        time_left, end = timer.extended(60)
+        assert time_left == 60
+        timer.set_end(end)
+        await asyncio.sleep(.01)
+        assert not timer.changed.is_set()
+
+        timer.set_enabled(False)
+        await asyncio.wait_for(timer.wait_changed(), timeout=1)
+        assert timer.time_left() == 0
+
+    asyncio.run(f())
+
+
+def test_timer_rearmed_after_early_wake_up():
+    async def f():
+        end = datetime.datetime.now() + datetime.timedelta(seconds=.01)
+        timer = vim_timer.VimTimer(enabled=True, end=end)
+        await timer.wait_changed()  # startup
+
+        # as if the wall clock jumped back after the expiry was scheduled
+        timer.end = datetime.datetime.now() + datetime.timedelta(seconds=60)
+        await asyncio.wait_for(timer.wait_changed(), timeout=1)
+        assert timer.time_left() > 0
+
+        assert timer._handle is not None
+        loop = asyncio.get_running_loop()
+        assert timer._handle.when() > loop.time() + 50
+
+    asyncio.run(f())
+
+
+def test_normalize_state_retries_failed_symlink(
+        tmp_path, set_symlink, config, fake_msg,
+):
+    set_symlink.side_effect = OSError('read-only file system')
+
+    async def f():
+        async with database(str(tmp_path.joinpath('db.db'))):
+            with pytest.raises(OSError):
+                msg = fake_msg('!vimtimeleft')
+                await vim_timer.vim_normalize_state(config, msg)
+            assert vim_timer._VIM_TIMER is not None
+            return vim_timer._VIM_TIMER.changed.is_set()
+
+    assert asyncio.run(f())
+
+
+def test_timer_restored_from_db(tmp_path, set_symlink, config, fake_msg):
+    filename = str(tmp_path.joinpath('db.db'))
+
+    async def bits():
+        async with database(filename):
+            msg = fake_msg('Cheer200', bits=200)
+            return await vim_timer.vim_bits_handler(config, msg)
+
+    async def time_left():
+        async with database(filename):
+            msg = fake_msg('!vimtimeleft')
+            await vim_timer.vim_normalize_state(config, msg)
+            return await vim_timer.cmd_vimtimeleft(config, msg)
+
+    ret = asyncio.run(bits())
+    assert ret == 'PRIVMSG #channel : MOAR VIM: 2 minutes, 29 seconds remaining\r\n'  # noqa: E501
+    set_symlink.assert_called_once_with(should_be_vim=True)
+
+    vim_timer._VIM_TIMER = None  # as if the bot restarted
+    ret = asyncio.run(time_left())
+    assert ret in {
+        'PRIVMSG #channel : vim time remaining: 2 minutes, 29 seconds\r\n',
+        'PRIVMSG #channel : vim time remaining: 2 minutes, 28 seconds\r\n',
+    }
+    set_symlink.assert_called_with(should_be_vim=True)
+
+
+def test_bits_rank_ignores_case(tmp_path):
+    async def f():
+        async with database(str(tmp_path.joinpath('db.db'))):
+            async with connect() as db:
+                query = 'INSERT INTO vim_bits (user, bits) VALUES (?, ?)'
+                await db.execute(query, ('Foo', 100))
+                await db.execute(query, ('foo', 100))
+                await db.execute(query, ('bar', 150))
+                await db.commit()
+                assert await vim_timer._user_rank_by_bits('FOO', db) == (
+                    1, 200,
+                )
+
+                await vim_timer.add_bits(db, 'BAR', 100)
+                assert await vim_timer._user_rank_by_bits('bar', db) == (
+                    1, 250,
+                )
+
+    asyncio.run(f())
+
+
+def test_enablevim(tmp_path, set_symlink, config, fake_msg):
+    async def f():
+        async with database(str(tmp_path.joinpath('db.db'))):
+            async with connect() as db:
+                await db.execute('INSERT INTO vim_enabled VALUES (0)')
+                await db.commit()
+            msg = fake_msg('Cheer200', bits=200)
+            await vim_timer.vim_bits_handler(config, msg)
+            timer = vim_timer._VIM_TIMER
+            assert timer is not None and not timer.enabled
+
+            # the timer is only enabled once it is in the db
+            msg = fake_msg('!enablevim', mod=True)
+            with mock.patch.object(
+                    vim_timer, 'disabled_seconds', side_effect=ValueError,
+            ):
+                with pytest.raises(ValueError):
+                    await vim_timer.cmd_enablevim(config, msg)
+            assert not timer.enabled
+
+            ret = await vim_timer.cmd_enablevim(config, msg)
+            assert timer.enabled
+            return ret
+
+    ret = asyncio.run(f())
+    assert ret == 'PRIVMSG #channel : vim has been enabled: time remaining 2 minutes, 29 seconds\r\n'  # noqa: E501
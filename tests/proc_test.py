@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from unittest import mock
+
+import pytest
+
+from bot import proc
+
+pytestmark = pytest.mark.skipif(
+    not os.path.isdir('/proc'), reason='requires /proc',
+)
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    with mock.patch.object(proc, '_PIDS', {}):
+        yield
+
+
+@pytest.fixture
+def sleeper(tmp_path):
+    # a uniquely named copy so nothing else on the machine matches it
+    name = f'slp{uuid.uuid4().hex[:8]}'
+    exe = tmp_path.joinpath(name)
+    sleep = shutil.which('sleep')
+    assert sleep is not None
+    shutil.copy(sleep, exe)
+    p = subprocess.Popen((exe, '60'))
+    try:
+        # the name is only updated part way through exec
+        deadline = time.monotonic() + 5
+        while proc._comm(p.pid) != name and time.monotonic() < deadline:
+            time.sleep(.001)
+        yield name, p
+    finally:
+        p.kill()
+        p.wait()
+
+
+def test_pids(sleeper):
+    name, p = sleeper
+    assert proc.pids(name) == (p.pid,)
+    assert proc.pids(f'{name}x') == ()
+
+
+def test_signal_all(sleeper):
+    name, p = sleeper
+    assert proc.signal_all(name, signal.SIGTERM) == 1
+    assert p.wait(timeout=5) == -signal.SIGTERM
+
+
+def test_signal_all_skips_exited_processes(sleeper):
+    name, p = sleeper
+    assert proc.pids(name) == (p.pid,)
+
+    p.kill()
+    p.wait()
+
+    assert proc.signal_all(name, signal.SIGTERM) == 0
+    assert name not in proc._PIDS  # invalidated
+
+
+def test_signal_all_no_processes():
+    assert proc.signal_all(f'nope{os.getpid()}', signal.SIGUSR1) == 0
+
+
+def test_pids_cached(sleeper):
+    name, p = sleeper
+    assert proc.pids(name) == (p.pid,)
+    with mock.patch.object(proc, '_scan') as scan:
+        assert proc.pids(name) == (p.pid,)
+    scan.assert_not_called()
+
+
+def test_pids_nothing_found_not_cached(sleeper):
+    name, p = sleeper
+    with mock.patch.object(proc, '_scan', return_value=()):
+        assert proc.pids(name) == ()
+    assert proc.pids(name) == (p.pid,)
+
+
+def test_pids_without_proc(tmp_path):
+    with mock.patch.object(proc, 'PROC', str(tmp_path.joinpath('nope'))):
+        assert proc.pids(sys.executable) == ()
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import pytest
+
+from bot.ranking import Leaderboard
+
+
+def test_leaderboard_rank():
+    leaderboard = Leaderboard.from_counts({'a': 1, 'b': 5, 'c': 5, 'd': 3})
+    assert leaderboard.rank('b') == (1, 5)
+    assert leaderboard.rank('c') == (1, 5)
+    assert leaderboard.rank('d') == (2, 3)
+    assert leaderboard.rank('a') == (3, 1)
+    assert leaderboard.rank('e') is None
+
+
+def test_leaderboard_increment():
+    leaderboard = Leaderboard.from_counts({'a': 1, 'b': 2})
+    leaderboard.increment('a')
+    assert leaderboard.rank('a') == (1, 2)
+    assert leaderboard.rank('b') == (1, 2)
+    leaderboard.increment('a', 3)
+    assert leaderboard.rank('a') == (1, 5)
+    assert leaderboard.rank('b') == (2, 2)
+    leaderboard.increment('c')
+    assert leaderboard.rank('c') == (3, 1)
+    assert leaderboard.counts == {'a': 5, 'b': 2, 'c': 1}
+
+
+@pytest.mark.parametrize(
+    ('n', 'expected'),
+    (
+        (0, []),
+        (1, [(1, 5, ['b'])]),
+        (2, [(1, 5, ['b', 'c'])]),
+        (3, [(1, 5, ['b', 'c']), (2, 3, ['d'])]),
+        (99, [(1, 5, ['b', 'c']), (2, 3, ['d']), (3, 1, ['a'])]),
+    ),
+)
+def test_leaderboard_top(n, expected):
+    leaderboard = Leaderboard.from_counts({'a': 1, 'b': 5, 'c': 5, 'd': 3})
+    assert list(leaderboard.top(n)) == expected
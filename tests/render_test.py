@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import asyncio
+
+from bot.render import RenderQueue
+
+
+async def _render(s, delay):
+    await asyncio.sleep(delay)
+    return s
+
+
+def test_render_queue_keeps_order():
+    printed: list[str] = []
+
+    async def main():
+        renderer = RenderQueue(print_func=printed.append)
+        renderer.start()
+        renderer.put('1')  # nothing ahead of it, printed right away
+        assert printed == ['1']
+        renderer.put_render(_render('2 images', .02), fallback='2')
+        renderer.put('3')
+        renderer.put_render(_render('4 images', 0), fallback='4')
+        await asyncio.sleep(.05)
+        await renderer.stop()
+        return renderer
+
+    renderer = asyncio.run(main())
+
+    assert printed == ['1', '2 images', '3', '4 images']
+    assert (renderer.rendered, renderer.fallbacks) == (2, 0)
+
+
+def test_render_queue_falls_back_after_deadline():
+    printed: list[str] = []
+
+    async def main():
+        renderer = RenderQueue(deadline=.02, print_func=printed.append)
+        renderer.start()
+        renderer.put_render(_render('1 images', 10), fallback='1')
+        renderer.put_render(_render('2 images', 10), fallback='2')
+        await asyncio.sleep(.05)
+        # both deadlines passed together, not one after the other
+        assert printed == ['1', '2']
+        await renderer.stop()
+        return renderer
+
+    renderer = asyncio.run(main())
+
+    assert renderer.fallbacks == 2
+
+
+def test_render_queue_error_falls_back():
+    printed: list[str] = []
+
+    async def boom():
+        raise ValueError('cdn down')
+
+    async def main():
+        renderer = RenderQueue(print_func=printed.append)
+        renderer.start()
+        renderer.put_render(boom(), fallback='1')
+        await asyncio.sleep(.01)
+        await renderer.stop()
+
+    asyncio.run(main())
+
+    assert printed == ['1']
+
+
+def test_render_queue_stop_prints_the_rest_as_text():
+    printed: list[str] = []
+
+    async def main():
+        renderer = RenderQueue(print_func=printed.append)
+        renderer.put_render(_render('1 images', 10), fallback='1')
+        renderer.put('2')
+        await renderer.stop()
+
+    asyncio.run(main())
+
+    assert printed == ['1', '2']
+
+
+def test_render_queue_stops_as_a_render_finishes():
+    printed: list[str] = []
+
+    async def main():
+        renderer = RenderQueue(print_func=printed.append)
+        renderer.start()
+        fut = asyncio.get_running_loop().create_future()
+        renderer.put_render(fut, fallback='1')
+        await asyncio.sleep(.01)
+        # done in the same loop iteration the renderer is cancelled in
+        fut.set_result('1 images')
+        await asyncio.wait_for(renderer.stop(), timeout=1)
+
+    asyncio.run(main())
+
+    assert printed == ['1']
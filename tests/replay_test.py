@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import os
+import re
+
+import pytest
+
+from bot.replay import _percentiles
+from bot.replay import load_transcript
+from bot.replay import sandbox
+
+
+def test_load_transcript(tmp_path):
+    transcript = tmp_path.joinpath('transcript.txt')
+    transcript.write_bytes(
+        b'> :tmi.twitch.tv 001 bot :Welcome, GLHF!\r\n'
+        b'< PONG :tmi.twitch.tv\r\n'
+        b'@badges=;color= :a!a@a PRIVMSG #chan :hello\n'
+        b'\n',
+    )
+    assert load_transcript(str(transcript)) == [
+        b':tmi.twitch.tv 001 bot :Welcome, GLHF!\r\n',
+        b'@badges=;color= :a!a@a PRIVMSG #chan :hello\r\n',
+    ]
+
+
+def test_sandbox(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv('HOME', str(tmp_path))
+
+    with sandbox() as tmpdir:
+        assert os.getcwd() == os.path.realpath(tmpdir)
+        assert os.path.expanduser('~') == tmpdir
+        with open('db.db', 'w'):
+            pass
+
+    assert os.getcwd() == str(tmp_path)
+    assert os.environ['HOME'] == str(tmp_path)
+    assert not os.path.exists(tmpdir)
+    assert not tmp_path.joinpath('db.db').exists()
+
+
+@pytest.mark.parametrize(
+    'values',
+    (
+        [.001, .002],
+        [.01, .02, .03, .075],
+        [i / 1000 for i in range(1, 50)],
+    ),
+)
+def test_percentiles_do_not_pass_the_max(values):
+    s = _percentiles(values)
+    p50, p90, p99, max_ = (float(x) for x in re.findall(r'=([\d.]+)ms', s))
+    assert p50 <= p90 <= p99 <= max_ == max(values) * 1000
+
+
+def test_percentiles_too_few():
+    assert _percentiles([.1]) == 'n/a'
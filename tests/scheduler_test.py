@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import selectors
+
+import pytest
+
+from bot.scheduler import Scheduler
+
+
+class _FakeClockSelector(selectors.DefaultSelector):
+    def __init__(self, loop):
+        super().__init__()
+        self.loop = loop
+
+    def select(self, timeout=None):
+        assert timeout is not None, 'the loop would wait forever'
+        ready = super().select(0)
+        if not ready:  # skip ahead rather than waiting
+            self.loop.now += timeout
+        return ready
+
+
+class FakeClockLoop(asyncio.SelectorEventLoop):
+    """time only passes when the loop would otherwise wait for it"""
+
+    def __init__(self):
+        self.now = 0.
+        super().__init__(_FakeClockSelector(self))
+
+    def time(self):
+        return self.now
+
+
+async def _noop(config, msg):
+    raise NotImplementedError
+
+
+def _run_for(seconds, scheduler):
+    async def f():
+        scheduler.start()
+        await asyncio.sleep(seconds)
+        await scheduler.stop()
+
+    with asyncio.Runner(loop_factory=FakeClockLoop) as runner:
+        runner.run(f())
+
+
+def test_scheduler_does_not_drift():
+    times = []
+
+    async def run(func):
+        times.append(asyncio.get_running_loop().time())
+        await asyncio.sleep(.03)  # a slow handler doesn't push the schedule
+
+    scheduler = Scheduler(run)
+    job = scheduler.add(.05, _noop)
+    _run_for(.52, scheduler)
+
+    assert job.runs == len(times) == 10
+    assert job.skipped == 0
+    assert times == pytest.approx([.05 * i for i in range(1, 11)])
+
+
+def test_scheduler_skips_while_running():
+    running = 0
+    overlapped = False
+
+    async def run(func):
+        nonlocal running, overlapped
+        overlapped = overlapped or running > 0
+        running += 1
+        try:
+            await asyncio.sleep(.12)
+        finally:
+            running -= 1
+
+    scheduler = Scheduler(run)
+    job = scheduler.add(.05, _noop)
+    _run_for(.38, scheduler)
+
+    # runs at .05, .20 and .35 (cancelled at .38), the rest are skipped
+    assert not overlapped
+    assert job.runs == 3
+    assert job.skipped == 4
+    assert job.max_runtime == pytest.approx(.12)
+
+
+def test_scheduler_jitter_delays_without_drift():
+    times = []
+
+    async def run(func):
+        times.append(asyncio.get_running_loop().time())
+
+    scheduler = Scheduler(run)
+    scheduler.add(.05, _noop, jitter=.02)
+    _run_for(.53, scheduler)
+
+    assert len(times) == 10
+    assert all(.03 <= b - a <= .07 for a, b in zip(times, times[1:]))
+
+
+def test_scheduler_stop_cancels_running_jobs():
+    cancelled = False
+
+    async def run(func):
+        nonlocal cancelled
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled = True
+            raise
+
+    scheduler = Scheduler(run)
+    job = scheduler.add(.01, _noop)
+    _run_for(.05, scheduler)
+
+    assert cancelled is True
+    assert not job.running
+    assert job.runs == 1
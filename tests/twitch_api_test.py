@@ -0,0 +1,251 @@
+from __future__ import annotations
+
+import asyncio
+import collections
+from typing import Any
+from unittest import mock
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from bot import twitch_api
+from bot.db import database
+from bot.http_session import client_session
+
+AUTH: dict[str, Any] = {'oauth_token': 'token', 'client_id': 'client'}
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    with (
+            mock.patch.object(
+                twitch_api, '_ENTRIES', collections.OrderedDict(),
+            ),
+            mock.patch.object(twitch_api, '_FETCHING', {}),
+            mock.patch.object(twitch_api, '_USER_BATCHES', {}),
+    ):
+        yield
+
+
+class Server:
+    def __init__(self) -> None:
+        self.requests: list[web.Request] = []
+        self.version = 1
+
+    async def handle(self, request):
+        self.requests.append(request)
+        await asyncio.sleep(.01)
+        etag = f'"v{self.version}"'
+        if request.headers.get('If-None-Match') == etag:
+            return web.Response(status=304)
+        else:
+            data = {'data': [{'version': self.version}]}
+            return web.json_response(data, headers={'ETag': etag})
+
+    async def users(self, request):
+        self.requests.append(request)
+        users = [
+            {'id': str(i), 'login': login}
+            for i, login in enumerate(request.query.getall('login'))
+            if login != 'nobody'
+        ]
+        return web.json_response({'data': users})
+
+
+@pytest.fixture
+def run_helix(tmp_path, stub_server):
+    """run `func(url)` against `server` at `url`, with a session and db"""
+    async def run_helix(server, func):
+        routes = {'/helix': server.handle, '/helix/users': server.users}
+        async with stub_server(routes) as base_url:
+            async with client_session(), database(tmp_path.joinpath('db.db')):
+                return await func(f'{base_url}/helix')
+
+    return run_helix
+
+
+def test_helix_get_cached_and_persisted(run_helix):
+    server = Server()
+
+    async def func(url):
+        # concurrent misses share a request
+        first, second = await asyncio.gather(
+            twitch_api.helix_get(url, **AUTH),
+            twitch_api.helix_get(url, **AUTH),
+        )
+        assert first == second == {'data': [{'version': 1}]}
+        assert await twitch_api.helix_get(url, **AUTH) == first
+
+        # a restart: loaded from the db
+        twitch_api._ENTRIES.clear()
+        assert await twitch_api.helix_get(url, **AUTH) == first
+
+    asyncio.run(run_helix(server, func))
+
+    assert len(server.requests) == 1
+    assert server.requests[0].headers['Client-ID'] == 'client'
+
+
+def test_helix_get_forgets_least_recently_used(run_helix):
+    server = Server()
+
+    async def func(url):
+        urls = [f'{url}?n={n}' for n in range(3)]
+        for u in urls:
+            await twitch_api.helix_get(u, **AUTH)
+        assert list(twitch_api._ENTRIES) == urls[1:]
+
+        # a hit is most recently used
+        await twitch_api.helix_get(urls[1], **AUTH)
+        assert list(twitch_api._ENTRIES) == [urls[2], urls[1]]
+
+        # an evicted response comes back from the db, not helix
+        assert await twitch_api.helix_get(urls[0], **AUTH) == {
+            'data': [{'version': 1}],
+        }
+        assert list(twitch_api._ENTRIES) == [urls[1], urls[0]]
+
+    with mock.patch.object(twitch_api, 'MAX_ENTRIES', 2):
+        asyncio.run(run_helix(server, func))
+    assert len(server.requests) == 3
+
+
+def test_helix_get_stale_while_revalidate(run_helix):
+    server = Server()
+
+    async def func(url):
+        await twitch_api.helix_get(url, **AUTH)
+
+        # unchanged: revalidated with the etag
+        stale = await twitch_api.helix_get(url, ttl=-1, **AUTH)
+        assert stale == {'data': [{'version': 1}]}
+        await twitch_api._FETCHING[url]
+        assert server.requests[-1].headers['If-None-Match'] == '"v1"'
+
+        # changed: the stale response is served while it is refreshed
+        server.version = 2
+        stale = await twitch_api.helix_get(url, ttl=-1, **AUTH)
+        assert stale == {'data': [{'version': 1}]}
+        await twitch_api._FETCHING[url]
+        assert await twitch_api.helix_get(url, **AUTH) == {
+            'data': [{'version': 2}],
+        }
+
+    asyncio.run(run_helix(server, func))
+
+    assert len(server.requests) == 3
+
+
+def _fetch_users(logins):
+    async def func(url):
+        with mock.patch.object(twitch_api, 'USERS_URL', f'{url}/users'):
+            return await asyncio.gather(*(
+                twitch_api.fetch_twitch_user(login, **AUTH)
+                for login in logins
+            ))
+
+    return func
+
+
+def test_fetch_twitch_user_batched(run_helix):
+    server = Server()
+
+    async def func(url):
+        users = await _fetch_users(('Foo', 'bar', 'nobody', 'bar'))(url)
+        # and then from the cache
+        assert await _fetch_users(('foo', 'nobody'))(url) == [users[0], None]
+        return users
+
+    foo, bar, nobody, bar2 = asyncio.run(run_helix(server, func))
+
+    assert foo is not None and foo['login'] == 'foo'
+    assert bar is not None and bar['login'] == 'bar'
+    assert bar2 == bar
+    assert nobody is None
+    request, = server.requests
+    assert request.query.getall('login') == ['foo', 'bar', 'nobody']
+
+
+def test_fetch_twitch_user_batch_size(run_helix):
+    server = Server()
+
+    with mock.patch.object(twitch_api, 'BATCH_SIZE', 2):
+        asyncio.run(run_helix(server, _fetch_users(('a', 'b', 'c'))))
+
+    logins = [request.query.getall('login') for request in server.requests]
+    assert logins == [['a', 'b'], ['c']]
+
+
+def test_errors_are_reported_once(run_helix, capsys):
+    server = Server()
+
+    async def func(url):
+        data = await twitch_api.helix_get(url, **AUTH)
+        with mock.patch.object(
+                twitch_api, '_fetch', side_effect=ValueError('refresh'),
+        ):
+            # the caller of a cold fetch gets the error
+            with pytest.raises(ValueError):
+                await twitch_api.helix_get(f'{url}?cold', **AUTH)
+
+            # nobody waits on a refresh, it is printed (once)
+            assert await twitch_api.helix_get(url, ttl=-1, **AUTH) == data
+            assert await twitch_api.helix_get(url, ttl=-1, **AUTH) == data
+            with pytest.raises(ValueError):
+                await twitch_api._FETCHING[url]
+
+    asyncio.run(run_helix(server, func))
+
+    assert capsys.readouterr().err.count('ValueError: refresh') == 1
+
+
+def test_user_batch_errors_are_reported_once(tmp_path, capsys):
+    def fetch_users(*logins):
+        return asyncio.gather(*(
+            twitch_api.fetch_twitch_user(login, **AUTH) for login in logins
+        ))
+
+    async def func():
+        stale = twitch_api._Entry(0, None, {'data': []})
+        for login in ('a', 'b'):
+            twitch_api._ENTRIES[twitch_api._user_url(login)] = stale
+
+        # the callers of cold lookups get the error
+        with pytest.raises(aiohttp.ClientError):
+            await fetch_users('c', 'd')
+        assert not capsys.readouterr().err
+
+        # nobody waits on refreshes, the batch prints it (once)
+        assert await fetch_users('a', 'b') == [None, None]
+        with pytest.raises(aiohttp.ClientError):
+            await twitch_api._FETCHING[twitch_api._user_url('a')]
+        await asyncio.gather(*twitch_api._TASKS)
+
+    async def run():
+        # nothing listens here
+        with mock.patch.object(twitch_api, 'USERS_URL', 'http://127.0.0.1:1'):
+            async with client_session(), database(tmp_path.joinpath('db')):
+                await func()
+
+    asyncio.run(run())
+
+    err = capsys.readouterr().err
+    assert err.count('\naiohttp.client_exceptions.ClientConnectorError:') == 1
+
+
+def test_user_batch_store_error_is_reported(run_helix, capsys):
+    server = Server()
+
+    async def func(url):
+        with mock.patch.object(
+                twitch_api, '_store', side_effect=ValueError('store'),
+        ):
+            foo, = await _fetch_users(('foo',))(url)
+            await asyncio.gather(*twitch_api._TASKS)
+        return foo
+
+    foo = asyncio.run(run_helix(server, func))
+
+    assert foo is not None and foo['login'] == 'foo'
+    assert capsys.readouterr().err.count('ValueError: store') == 1
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from bot.util import atomic_symlink
+
+
+def test_atomic_symlink_creates(tmp_path):
+    link = tmp_path.joinpath('link')
+    atomic_symlink('target', str(link))
+    assert os.readlink(link) == 'target'
+
+
+def test_atomic_symlink_replaces(tmp_path):
+    link = tmp_path.joinpath('link')
+    link.symlink_to('old')
+    atomic_symlink('new', str(link))
+    assert os.readlink(link) == 'new'
+    assert os.listdir(tmp_path) == ['link']
+
+
+def test_atomic_symlink_cleans_up_on_error(tmp_path):
+    link = tmp_path.joinpath('link')
+    link.mkdir()  # can't replace a directory with a symlink
+    with pytest.raises(OSError):
+        atomic_symlink('new', str(link))
+    assert os.listdir(tmp_path) == ['link']